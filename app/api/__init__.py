@@ -1,3 +1,5 @@
+import hmac
+from typing import Annotated
 from fastapi import (
     APIRouter,
     Depends,
@@ -6,22 +8,55 @@ from fastapi import (
     status,
 )
 from fastapi.security import APIKeyHeader
+from app.settings import get_settings
+from .api_keys.use_cases import VerifyApiKey
+from .api_keys.views import router as api_key_router
+from .batch.views import router as batch_router
 from .wallets.views import router as wallet_router
 
 async def get_api_key(
+    use_case: Annotated[
+        VerifyApiKey, Depends(VerifyApiKey)
+    ],
     api_key_header: str = Security(
         APIKeyHeader(
             name="APP-API-KEY", auto_error=True
         )
     ),
 ) -> str:
-    if api_key_header != "DUMMY-KEY":
+    if not await use_case.execute(api_key_header):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN
         )
     return api_key_header
 
-router = APIRouter(
+async def get_admin_key(
+    admin_key_header: str = Security(
+        APIKeyHeader(
+            name="APP-ADMIN-KEY", auto_error=True
+        )
+    ),
+) -> str:
+    admin_key = get_settings().admin_api_key
+    if not admin_key or not hmac.compare_digest(
+        admin_key_header.encode(), admin_key.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN
+        )
+    return admin_key_header
+
+client_router = APIRouter(
     dependencies=[Depends(get_api_key)]
 )
-router.include_router(wallet_router)
+client_router.include_router(wallet_router)
+client_router.include_router(batch_router)
+
+admin_router = APIRouter(
+    dependencies=[Depends(get_admin_key)]
+)
+admin_router.include_router(api_key_router)
+
+router = APIRouter()
+router.include_router(client_router)
+router.include_router(admin_router)
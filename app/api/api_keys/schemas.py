@@ -0,0 +1,21 @@
+from pydantic import Field
+from app.models import BaseModel, UTCDatetime
+
+class ApiKey(BaseModel):
+    api_key_id: int
+    name: str = Field(..., description="利用者を識別する名前")
+    created_at: UTCDatetime
+    revoked_at: UTCDatetime | None = Field(
+        ..., description="失効日時（有効なキーはnull）")
+
+class GetApiKeysResponse(BaseModel):
+    api_keys: list[ApiKey]
+
+class PostApiKeyRequest(BaseModel):
+    name: str
+
+class PostApiKeyResponse(ApiKey):
+    key: str = Field(
+        ...,
+        description="APIキー（平文は保存しないため、この応答でのみ返す）",
+    )
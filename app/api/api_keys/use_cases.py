@@ -0,0 +1,69 @@
+from app.database import (
+    ApiKeyRepository,
+    AsyncReadSession,
+    AsyncSession,
+)
+from app.exceptions import NotFound
+from app.models import ApiKey
+
+class VerifyApiKey:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: ApiKeyRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(self, key: str) -> bool:
+        # キャッシュに当たればDBには接続しない
+        async with self.session() as session:
+            return await self.repo.verify(session, key)
+
+class ListApiKeys:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: ApiKeyRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(self) -> list[ApiKey]:
+        async with self.session() as session:
+            api_keys = await self.repo.get_all(session)
+        return api_keys
+
+class CreateApiKey:
+    def __init__(
+        self,
+        session: AsyncSession,
+        repo: ApiKeyRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self, name: str
+    ) -> tuple[ApiKey, str]:
+        async with self.session.begin() as session:
+            api_key, key = await self.repo.add(
+                session, name=name
+            )
+        return api_key, key
+
+class RevokeApiKey:
+    def __init__(
+        self,
+        session: AsyncSession,
+        repo: ApiKeyRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(self, api_key_id: int) -> None:
+        async with self.session.begin() as session:
+            if not await self.repo.revoke(
+                session, api_key_id
+            ):
+                raise NotFound("api_key", api_key_id)
@@ -0,0 +1,63 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, status
+from app.routes import LoggingRoute
+from .schemas import (
+    ApiKey,
+    GetApiKeysResponse,
+    PostApiKeyRequest,
+    PostApiKeyResponse,
+)
+from .use_cases import (
+    CreateApiKey,
+    ListApiKeys,
+    RevokeApiKey,
+)
+
+router = APIRouter(
+    prefix="/v1/admin/api-keys", route_class=LoggingRoute
+)
+
+@router.get("", response_model=GetApiKeysResponse)
+async def get_api_keys(
+    use_case: Annotated[
+        ListApiKeys, Depends(ListApiKeys)
+    ],
+) -> GetApiKeysResponse:
+    """APIキーの一覧取得API"""
+    return GetApiKeysResponse(
+        api_keys=[ApiKey.model_validate(k)
+            for k in await use_case.execute()],
+    )
+
+@router.post(
+    "",
+    response_model=PostApiKeyResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def post_api_key(
+    data: PostApiKeyRequest,
+    use_case: Annotated[
+        CreateApiKey, Depends(CreateApiKey)
+    ],
+) -> PostApiKeyResponse:
+    """APIキーの発行API"""
+    api_key, key = await use_case.execute(name=data.name)
+    return PostApiKeyResponse(
+        **dict(api_key), key=key
+    )
+
+@router.delete(
+    "/{api_key_id}",
+    status_code=status.HTTP_204_NO_CONTENT
+)
+async def delete_api_key(
+    api_key_id: int,
+    use_case: Annotated[
+        RevokeApiKey, Depends(RevokeApiKey)
+    ],
+) -> None:
+    """APIキーの失効API
+
+    他のプロセスでは APP_API_KEY_CACHE_TTL 秒以内に失効する
+    """
+    await use_case.execute(api_key_id=api_key_id)
@@ -0,0 +1,77 @@
+from typing import Annotated, Literal
+from pydantic import Field, PositiveInt
+from app.models import BaseModel, HistoryType, UTCDatetime
+from ..wallets.histories.schemas import History
+from ..wallets.schemas import Wallet
+
+# 前の操作の結果を "$<操作のインデックス>.<フィールド>" で参照できる
+Reference = Annotated[
+    str, Field(pattern=r"^\$\d+\.[a-z_]+$")
+]
+Id = int | Reference
+
+class CreateWalletOperation(BaseModel):
+    op: Literal["createWallet"]
+    name: str
+
+class UpdateWalletOperation(BaseModel):
+    op: Literal["updateWallet"]
+    wallet_id: Id
+    name: str
+
+class DeleteWalletOperation(BaseModel):
+    op: Literal["deleteWallet"]
+    wallet_id: Id
+
+class CreateHistoryOperation(BaseModel):
+    op: Literal["createHistory"]
+    wallet_id: Id
+    name: str
+    amount: PositiveInt
+    type: HistoryType = Field(
+        ..., description="INCOME:収入, OUTCOME:支出")
+    history_at: UTCDatetime = Field(
+        ..., description="収支項目の発生日時（UTC）")
+
+class UpdateHistoryOperation(CreateHistoryOperation):
+    op: Literal["updateHistory"]
+    history_id: Id
+
+class MoveHistoryOperation(BaseModel):
+    op: Literal["moveHistory"]
+    wallet_id: Id
+    history_id: Id
+    destination_id: Id = Field(
+        ..., description="移動先WalletのID")
+
+class DeleteHistoryOperation(BaseModel):
+    op: Literal["deleteHistory"]
+    wallet_id: Id
+    history_id: Id
+
+Operation = Annotated[
+    CreateWalletOperation
+    | UpdateWalletOperation
+    | DeleteWalletOperation
+    | CreateHistoryOperation
+    | UpdateHistoryOperation
+    | MoveHistoryOperation
+    | DeleteHistoryOperation,
+    Field(discriminator="op"),
+]
+
+class PostBatchRequest(BaseModel):
+    operations: list[Operation] = Field(
+        ..., min_length=1, max_length=1000
+    )
+
+class OperationResult(BaseModel):
+    op: str
+    wallet: Wallet | None = Field(
+        None, description="作成・更新したWallet")
+    history: History | None = Field(
+        None, description="作成・更新・移動した収支項目")
+
+class PostBatchResponse(BaseModel):
+    results: list[OperationResult] = Field(
+        ..., description="操作ごとの結果（リクエスト順）")
@@ -0,0 +1,118 @@
+import re
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession as _AsyncSession
+from app.database import AsyncSession, WalletRepository
+from app.exceptions import AppException, BadRequest
+from app.models import History, Wallet
+from ..wallets.histories.use_cases import (
+    CreateHistory,
+    DeleteHistory,
+    MoveHistory,
+    UpdateHistory,
+)
+from ..wallets.use_cases import (
+    CreateWallet,
+    DeleteWallet,
+    UpdateWallet,
+)
+from .schemas import Operation
+
+_REFERENCE = re.compile(r"^\$(\d+)\.([a-z_]+)$")
+
+class _SharedSession:
+    """既存のユースケースに1つのセッションを使わせる
+
+    begin() はコミットせずに同じセッションを返すため、
+    全ての操作が呼び出し元の1トランザクションに入る
+    """
+
+    def __init__(self, session: _AsyncSession) -> None:
+        self._session = session
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator[_AsyncSession]:
+        yield self._session
+
+    __call__ = begin
+
+def _resolve(
+    value: int | str, results: list[Wallet | History | None]
+) -> int:
+    if isinstance(value, int):
+        return value
+    match = _REFERENCE.match(value)
+    index, field = int(match[1]), match[2]
+    # 後の操作や結果のない操作（削除）は参照できない
+    if index >= len(results) or results[index] is None:
+        raise BadRequest("reference", value)
+    resolved = getattr(results[index], field, None)
+    if not isinstance(resolved, int):
+        raise BadRequest("reference", value)
+    return resolved
+
+class RunBatch:
+    def __init__(
+        self,
+        session: AsyncSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self, operations: list[Operation]
+    ) -> list[Wallet | History | None]:
+        """全ての操作を1トランザクションで実行する
+
+        1つでも失敗したら何も反映せず、失敗した操作のインデックスを返す
+        """
+        results: list[Wallet | History | None] = []
+        async with self.session.begin() as session:
+            shared = _SharedSession(session)
+            for index, operation in enumerate(operations):
+                try:
+                    params = {
+                        k: _resolve(v, results)
+                        if k.endswith("_id") else v
+                        for k, v in operation
+                    }
+                    results.append(
+                        await self._run(shared, params)
+                    )
+                except AppException as e:
+                    e.details = {
+                        "operation": index,
+                        **(e.details or {}),
+                    }
+                    raise
+        return results
+
+    async def _run(
+        self, session: _SharedSession, params: dict
+    ) -> Wallet | History | None:
+        repo = self.repo
+        match params.pop("op"):
+            case "createWallet":
+                return await CreateWallet(
+                    session, repo).execute(**params)
+            case "updateWallet":
+                return await UpdateWallet(
+                    session, repo).execute(**params)
+            case "deleteWallet":
+                return await DeleteWallet(
+                    session, repo).execute(**params)
+            case "createHistory":
+                params["type_"] = params.pop("type")
+                return await CreateHistory(
+                    session, repo).execute(**params)
+            case "updateHistory":
+                params["type_"] = params.pop("type")
+                return await UpdateHistory(
+                    session, repo).execute(**params)
+            case "moveHistory":
+                return await MoveHistory(
+                    session, repo).execute(**params)
+            case "deleteHistory":
+                return await DeleteHistory(
+                    session, repo).execute(**params)
@@ -0,0 +1,53 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Request
+from app.models import History as HistoryEntity
+from app.models import Wallet as WalletEntity
+from app.rate_limit import consume
+from app.routes import LoggingRoute
+from ..wallets.histories.schemas import History
+from ..wallets.schemas import Wallet
+from .schemas import (
+    OperationResult,
+    PostBatchRequest,
+    PostBatchResponse,
+)
+from .use_cases import RunBatch
+
+router = APIRouter(
+    prefix="/v1/batch", route_class=LoggingRoute
+)
+
+@router.post("", response_model=PostBatchResponse)
+async def post_batch(
+    data: PostBatchRequest,
+    use_case: Annotated[RunBatch, Depends(RunBatch)],
+    request: Request,
+) -> PostBatchResponse:
+    """複数操作の一括実行API
+
+    操作を順に1トランザクションで実行し、1つでも失敗したら何も反映しない
+    後の操作のIDには "$<操作のインデックス>.<フィールド>" で前の結果を使える
+    """
+    # 1操作分はミドルウェアで数えているため、残りの操作数だけ消費する
+    await consume(request, len(data.operations) - 1)
+    results = await use_case.execute(data.operations)
+    return PostBatchResponse(
+        results=[
+            OperationResult(
+                op=operation.op,
+                wallet=(
+                    Wallet.model_validate(result)
+                    if isinstance(result, WalletEntity)
+                    else None
+                ),
+                history=(
+                    History.model_validate(result)
+                    if isinstance(result, HistoryEntity)
+                    else None
+                ),
+            )
+            for operation, result in zip(
+                data.operations, results
+            )
+        ]
+    )
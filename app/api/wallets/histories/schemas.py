@@ -1,4 +1,5 @@
-from pydantic import Field, PositiveInt
+from enum import StrEnum
+from pydantic import Field, PositiveInt, model_validator
 from app.models import BaseModel, HistoryType, UTCDatetime
 
 class History(BaseModel):
@@ -10,11 +11,19 @@ class History(BaseModel):
     history_at: UTCDatetime = Field(
         ..., description="収支項目の発生日時（UTC）")
 
+class ExportFormat(StrEnum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
 class GetHistoryResponse(History):
     pass
 
 class GetHistoriesResponse(BaseModel):
     histories: list[History]
+    next_cursor: str | None = Field(
+        None,
+        description="次ページ取得用のカーソル（最終ページではnull）",
+    )
 
 class PostHistoryRequest(BaseModel):
     name: str
@@ -27,6 +36,16 @@ class PostHistoryRequest(BaseModel):
 class PostHistoryResponse(History):
     pass
 
+class PostHistoriesRequest(BaseModel):
+    histories: list[PostHistoryRequest] = Field(
+        ..., min_length=1, max_length=10000
+    )
+
+class PostHistoriesResponse(BaseModel):
+    history_ids: list[int] = Field(
+        ..., description="作成した収支項目のID（リクエスト順）"
+    )
+
 class PutHistoryRequest(BaseModel):
     name: str
     amount: PositiveInt
@@ -44,3 +63,36 @@ class MoveHistoryRequest(BaseModel):
 
 class MoveHistoryResponse(History):
     pass
+
+class MoveHistoriesRequest(BaseModel):
+    destination_id: int = Field(
+        ..., description="移動先WalletのID")
+    history_ids: list[int] | None = Field(
+        None,
+        min_length=1,
+        max_length=10000,
+        description="移動する収支項目のID",
+    )
+    since: UTCDatetime | None = Field(
+        None,
+        alias="from",
+        description="この日時以降の収支項目を移動する",
+    )
+    until: UTCDatetime | None = Field(
+        None,
+        alias="to",
+        description="この日時より前の収支項目を移動する",
+    )
+
+    @model_validator(mode="after")
+    def check_filter(self) -> "MoveHistoriesRequest":
+        if self.history_ids is not None and (
+            self.since or self.until
+        ):
+            raise ValueError(
+                "history_ids cannot be combined with from/to"
+            )
+        return self
+
+class MoveHistoriesResponse(BaseModel):
+    moved: int = Field(..., description="移動した収支項目の件数")
@@ -1,36 +1,102 @@
+from collections.abc import AsyncIterator
 from datetime import datetime
 from app.database import (
+    AsyncReadSession,
     AsyncSession,
     WalletRepository,
 )
-from app.exceptions import NotFound
-from app.models import History, HistoryType
+from app.exceptions import BadRequest, NotFound
+from app.models import History, HistoryType, NewHistory
+from app.utils.cursor import decode_cursor, encode_cursor
+from app.utils.datetime import as_utc
 
 class ListHistories:
     def __init__(
         self,
-        session: AsyncSession,
+        session: AsyncReadSession,
         repo: WalletRepository,
     ) -> None:
         self.session = session
         self.repo = repo
 
     async def execute(
-        self, wallet_id: int
-    ) -> list[History]:
+        self,
+        wallet_id: int,
+        limit: int,
+        cursor: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> tuple[list[History], str | None]:
+        after = None
+        if cursor is not None:
+            try:
+                history_at, history_id = decode_cursor(
+                    cursor
+                )
+                after = (
+                    datetime.fromisoformat(history_at),
+                    int(history_id),
+                )
+            except (TypeError, ValueError):
+                raise BadRequest("cursor", cursor)
+
         async with self.session() as session:
-            wallet = await self.repo.get_by_id(
+            if not await self.repo.exists(
                 session, wallet_id
+            ):
+                raise NotFound("wallet", wallet_id)
+            # 次ページの有無を判定するため1件多く取得する
+            histories = await self.repo.get_histories(
+                session,
+                wallet_id,
+                limit=limit + 1,
+                after=after,
+                since=as_utc(since) if since else None,
+                until=as_utc(until) if until else None,
             )
-            if not wallet:
+
+        if len(histories) <= limit:
+            return histories, None
+        histories = histories[:limit]
+        last = histories[-1]
+        return histories, encode_cursor(
+            last.history_at.isoformat(),
+            last.history_id,
+        )
+
+class ExportHistories:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self, wallet_id: int
+    ) -> AsyncIterator[list[History]]:
+        # ストリーミング開始後はステータスコードを変えられないため先に存在確認する
+        async with self.session() as session:
+            if not await self.repo.exists(
+                session, wallet_id
+            ):
                 raise NotFound("wallet", wallet_id)
+        return self._stream(wallet_id)
 
-        return wallet.histories
+    async def _stream(
+        self, wallet_id: int
+    ) -> AsyncIterator[list[History]]:
+        async with self.session() as session:
+            async for histories in self.repo.stream_histories(
+                session, wallet_id
+            ):
+                yield histories
 
 class GetHistory:
     def __init__(
         self,
-        session: AsyncSession,
+        session: AsyncReadSession,
         repo: WalletRepository,
     ) -> None:
         self.session = session
@@ -50,6 +116,28 @@ class GetHistory:
 
         return history
 
+class CheckHistoryExists:
+    """収支項目の存在だけを主キーで確認する"""
+
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self,
+        wallet_id: int,
+        history_id: int,
+    ) -> None:
+        async with self.session() as session:
+            if not await self.repo.history_exists(
+                session, wallet_id, history_id
+            ):
+                raise NotFound("history", history_id)
+
 class CreateHistory:
     def __init__(
         self,
@@ -68,20 +156,43 @@ class CreateHistory:
         history_at: datetime,
     ) -> History:
         async with self.session.begin() as session:
-            wallet = await self.repo.get_by_id(session, wallet_id)
-            if not wallet:
-                raise NotFound("wallet", wallet_id)
-
             history = await self.repo.add_history(
                 session,
-                wallet.wallet_id,
+                wallet_id,
                 name=name,
                 amount=amount,
                 type_=type_,
                 history_at=history_at,
             )
+            if not history:
+                raise NotFound("wallet", wallet_id)
         return history
 
+class BulkCreateHistories:
+    def __init__(
+        self,
+        session: AsyncSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self,
+        wallet_id: int,
+        histories: list[NewHistory],
+    ) -> list[int]:
+        async with self.session.begin() as session:
+            if not await self.repo.exists(
+                session, wallet_id
+            ):
+                raise NotFound("wallet", wallet_id)
+
+            history_ids = await self.repo.add_histories(
+                session, wallet_id, histories
+            )
+        return history_ids
+
 class UpdateHistory:
     def __init__(
         self,
@@ -101,15 +212,17 @@ class UpdateHistory:
         history_at: datetime,
     ) -> History:
         async with self.session.begin() as session:
-            history = await self.repo.get_history_by_id(session, wallet_id, history_id)
+            history = await self.repo.update_history(
+                session,
+                wallet_id,
+                history_id,
+                name=name,
+                amount=amount,
+                type_=type_,
+                history_at=history_at,
+            )
             if not history:
                 raise NotFound("history", history_id)
-
-            history.name = name
-            history.amount = amount
-            history.type = type_
-            history.history_at = history_at
-            await self.repo.update_history(session, wallet_id, history)
         return history
 
 class DeleteHistory:
@@ -125,9 +238,9 @@ class DeleteHistory:
         self, wallet_id: int, history_id: int
     ) -> None:
         async with self.session.begin() as session:
-            history = await self.repo.get_history_by_id(session, wallet_id, history_id)
-            if history:
-                await self.repo.delete_history(session, history.wallet_id, history)
+            await self.repo.delete_history(
+                session, wallet_id, history_id
+            )
 
 class MoveHistory:
     def __init__(
@@ -145,14 +258,48 @@ class MoveHistory:
         destination_id: int
     ) -> History:
         async with self.session.begin() as session:
-            history = await self.repo.get_history_by_id(session, wallet_id, history_id)
+            if not await self.repo.exists(
+                session, destination_id
+            ):
+                raise NotFound("wallet", destination_id)
+
+            history = await self.repo.move_history(
+                session,
+                wallet_id,
+                history_id,
+                destination_id=destination_id,
+            )
             if not history:
                 raise NotFound("history", history_id)
+        return history
 
-            wallet = await self.repo.get_by_id(session, destination_id)
-            if not wallet:
-                raise NotFound("wallet", wallet_id)
+class MoveHistories:
+    def __init__(
+        self,
+        session: AsyncSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
 
-            history.wallet_id = wallet.wallet_id
-            await self.repo.update_history(session, wallet_id, history)
-        return history
+    async def execute(
+        self,
+        wallet_id: int,
+        destination_id: int,
+        history_ids: list[int] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> int:
+        async with self.session.begin() as session:
+            for id_ in (wallet_id, destination_id):
+                if not await self.repo.exists(session, id_):
+                    raise NotFound("wallet", id_)
+            moved = await self.repo.move_histories(
+                session,
+                wallet_id,
+                destination_id,
+                history_ids=history_ids,
+                since=as_utc(since) if since else None,
+                until=as_utc(until) if until else None,
+            )
+        return moved
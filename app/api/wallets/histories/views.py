@@ -1,24 +1,51 @@
+import csv
+import io
+from collections.abc import AsyncIterator
+from datetime import datetime
 from typing import Annotated
-from fastapi import APIRouter, Depends, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from app.responses import FastJSONResponse, dump, render
+from app.models import History as HistoryEntity
+from app.models import NewHistory
 from app.routes import LoggingRoute
+from app.utils.datetime import as_utc
+from app.utils.etag import etag_matches
+from ..use_cases import GetWalletETag
 from .schemas import (
+    ExportFormat,
     GetHistoriesResponse,
     GetHistoryResponse,
     History,
+    MoveHistoriesRequest,
+    MoveHistoriesResponse,
     MoveHistoryRequest,
     MoveHistoryResponse,
+    PostHistoriesRequest,
+    PostHistoriesResponse,
     PostHistoryRequest,
     PostHistoryResponse,
     PutHistoryRequest,
     PutHistoryResponse,
 )
 from .use_cases import (
+    BulkCreateHistories,
+    CheckHistoryExists,
+    ExportHistories,
     GetHistory,
     ListHistories,
     CreateHistory,
     UpdateHistory,
     DeleteHistory,
     MoveHistory,
+    MoveHistories,
 )
 
 router = APIRouter(
@@ -31,11 +58,131 @@ async def get_histories(
     use_case: Annotated[
         ListHistories, Depends(ListHistories)
     ],
-) -> GetHistoriesResponse:
-    """収支項目の一覧取得API"""
-    return GetHistoriesResponse(
-        histories=[History.model_validate(h)
-            for h in await use_case.execute(wallet_id)]
+    etag_use_case: Annotated[
+        GetWalletETag, Depends(GetWalletETag)
+    ],
+    limit: int = Query(
+        100, ge=1, le=1000, description="1ページの最大件数"
+    ),
+    cursor: str | None = Query(
+        None,
+        description="前ページのレスポンスのnext_cursor",
+    ),
+    since: datetime | None = Query(
+        None,
+        alias="from",
+        description="この日時以降の収支項目に絞り込む",
+    ),
+    until: datetime | None = Query(
+        None,
+        alias="to",
+        description="この日時より前の収支項目に絞り込む",
+    ),
+    if_none_match: str | None = Header(None),
+) -> Response:
+    """収支項目の一覧取得API
+
+    history_atの降順で返す
+    期間はfromを含みtoを含まない
+    If-None-MatchがETagと一致する場合は304を返す
+    """
+    etag = await etag_use_case.execute(wallet_id)
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
+    histories, next_cursor = await use_case.execute(
+        wallet_id=wallet_id,
+        limit=limit,
+        cursor=cursor,
+        since=since,
+        until=until,
+    )
+    return render(
+        GetHistoriesResponse,
+        {"histories": histories, "next_cursor": next_cursor},
+        headers={"ETag": etag},
+    )
+
+async def _to_ndjson(
+    partitions: AsyncIterator[list[HistoryEntity]],
+) -> AsyncIterator[bytes]:
+    encode = FastJSONResponse(None).render
+    async for histories in partitions:
+        yield b"".join(
+            encode(dump(History, h)) + b"\n"
+            for h in histories
+        )
+
+def _csv_row(row: dict) -> dict:
+    # JSONと同じくUTCの日時は末尾Zで出力する
+    history_at = as_utc(row["history_at"])
+    row["history_at"] = history_at.isoformat().replace(
+        "+00:00", "Z"
+    )
+    return row
+
+async def _to_csv(
+    partitions: AsyncIterator[list[HistoryEntity]],
+) -> AsyncIterator[str]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(
+        buf, fieldnames=list(History.model_fields)
+    )
+    writer.writeheader()
+    yield buf.getvalue()
+    async for histories in partitions:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(
+            _csv_row(dump(History, h)) for h in histories
+        )
+        yield buf.getvalue()
+
+@router.get(
+    ":export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {
+                "application/x-ndjson": {},
+                "text/csv": {},
+            }
+        }
+    },
+)
+async def export_histories(
+    wallet_id: int,
+    use_case: Annotated[
+        ExportHistories, Depends(ExportHistories)
+    ],
+    format: ExportFormat = Query(
+        ExportFormat.NDJSON, description="出力形式"
+    ),
+) -> StreamingResponse:
+    """収支項目のエクスポートAPI
+
+    全件をhistory_atの降順で逐次出力する
+    """
+    partitions = await use_case.execute(
+        wallet_id=wallet_id
+    )
+    if format == ExportFormat.CSV:
+        return StreamingResponse(
+            _to_csv(partitions),
+            media_type="text/csv",
+            headers={
+                "Content-Disposition": (
+                    "attachment; "
+                    f'filename="wallet_{wallet_id}.csv"'
+                )
+            },
+        )
+    return StreamingResponse(
+        _to_ndjson(partitions),
+        media_type="application/x-ndjson",
     )
 
 @router.get(
@@ -48,13 +195,34 @@ async def get_history(
     use_case: Annotated[
         GetHistory, Depends(GetHistory)
     ],
-) -> GetHistoryResponse:
-    """収支項目の個別取得API"""
-    return GetHistoryResponse.model_validate(
+    etag_use_case: Annotated[
+        GetWalletETag, Depends(GetWalletETag)
+    ],
+    exists_use_case: Annotated[
+        CheckHistoryExists, Depends(CheckHistoryExists)
+    ],
+    if_none_match: str | None = Header(None),
+) -> Response:
+    """収支項目の個別取得API
+
+    If-None-MatchがETagと一致する場合は304を返す
+    """
+    etag = await etag_use_case.execute(wallet_id)
+    if etag_matches(if_none_match, etag):
+        # ETagはWallet単位のため、存在しない収支項目には304を返さない
+        await exists_use_case.execute(wallet_id, history_id)
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
+    return render(
+        GetHistoryResponse,
         await use_case.execute(
             wallet_id=wallet_id,
             history_id=history_id,
         ),
+        headers={"ETag": etag},
     )
 
 @router.post(
@@ -81,6 +249,61 @@ async def post_history(
     )
 
 
+@router.post(
+    ":bulk",
+    response_model=PostHistoriesResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def post_histories(
+    wallet_id: int,
+    data: PostHistoriesRequest,
+    use_case: Annotated[
+        BulkCreateHistories,
+        Depends(BulkCreateHistories),
+    ],
+) -> PostHistoriesResponse:
+    """収支項目の一括作成API
+
+    全件を1トランザクションで作成し、1件でも不正なら何も作成しない
+    """
+    return PostHistoriesResponse(
+        history_ids=await use_case.execute(
+            wallet_id=wallet_id,
+            histories=[
+                NewHistory.model_validate(h)
+                for h in data.histories
+            ],
+        ),
+    )
+
+
+@router.post(
+    ":move",
+    response_model=MoveHistoriesResponse,
+)
+async def move_histories(
+    wallet_id: int,
+    data: MoveHistoriesRequest,
+    use_case: Annotated[
+        MoveHistories, Depends(MoveHistories)
+    ],
+) -> MoveHistoriesResponse:
+    """収支項目の一括移動API
+
+    history_ids か期間（fromを含みtoを含まない）で対象を指定する
+    どちらも指定しなければWalletの全ての収支項目を移動する
+    """
+    return MoveHistoriesResponse(
+        moved=await use_case.execute(
+            wallet_id=wallet_id,
+            destination_id=data.destination_id,
+            history_ids=data.history_ids,
+            since=data.since,
+            until=data.until,
+        ),
+    )
+
+
 @router.put(
     "/{history_id}",
     response_model=PutHistoryResponse
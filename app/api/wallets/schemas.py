@@ -1,5 +1,6 @@
+from datetime import date
 from pydantic import Field
-from app.models import BaseModel
+from app.models import BaseModel, Granularity, UTCDatetime
 from .histories.schemas import History
 
 class Wallet(BaseModel):
@@ -10,6 +11,10 @@ class Wallet(BaseModel):
 
 class GetWalletsResponse(BaseModel):
     wallets: list[Wallet]
+    next_cursor: str | None = Field(
+        None,
+        description="次ページ取得用のカーソル（最終ページではnull）",
+    )
 
 class GetWalletResponse(Wallet):
     pass
@@ -18,6 +23,48 @@ class GetWalletResponseWithHistories(Wallet):
     histories: list[History] = Field(
         ..., description="関連する収支項目一覧")
 
+class BatchGetWalletsRequest(BaseModel):
+    wallet_ids: list[int] = Field(
+        ..., min_length=1, max_length=1000)
+    include_histories: bool = Field(
+        False,
+        description="収支項目一覧もレスポンスに含める場合はTrue",
+    )
+    history_limit: int | None = Field(
+        None,
+        ge=1,
+        description="Walletごとに含める収支項目の最大件数（新しい順）",
+    )
+
+class BatchGetWalletsResponse(BaseModel):
+    wallets: list[GetWalletResponse] = Field(
+        ..., description="取得できたWallet（リクエスト順）")
+    missing_ids: list[int] = Field(
+        ..., description="存在しなかったWalletのID")
+
+class BatchGetWalletsResponseWithHistories(
+    BatchGetWalletsResponse
+):
+    wallets: list[GetWalletResponseWithHistories] = Field(
+        ..., description="取得できたWallet（リクエスト順）")
+
+class Summary(BaseModel):
+    bucket: date = Field(
+        ..., description="集計期間の初日（UTC）")
+    income: int
+    outcome: int
+    net: int = Field(..., description="income - outcome")
+
+class GetSummaryResponse(BaseModel):
+    granularity: Granularity
+    summaries: list[Summary]
+
+class GetBalanceResponse(BaseModel):
+    wallet_id: int
+    at: UTCDatetime
+    balance: int = Field(
+        ..., description="at 時点（その時刻を含む）の予算")
+
 class PostWalletRequest(BaseModel):
     name: str
 
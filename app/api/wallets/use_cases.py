@@ -1,46 +1,174 @@
 from app.database import (
+    AsyncReadSession,
     AsyncSession,
     WalletRepository,
 )
-from app.exceptions import NotFound
-from app.models import Wallet
+from app.exceptions import BadRequest, NotFound
+from datetime import date, datetime
+from app.models import (
+    Granularity,
+    Summary,
+    Wallet,
+    WalletSummary,
+)
+from app.utils.cursor import decode_cursor, encode_cursor
+from app.utils.datetime import as_utc
+from app.utils.etag import make_etag
 
 class ListWallets:
     def __init__(
         self,
-        session: AsyncSession,
+        session: AsyncReadSession,
         repo: WalletRepository,
     ) -> None:
         self.session = session
         self.repo = repo
 
-    async def execute(self) -> list[Wallet]:
+    async def execute(
+        self, limit: int, cursor: str | None = None
+    ) -> tuple[list[WalletSummary], str | None]:
+        after = None
+        if cursor is not None:
+            try:
+                (after,) = decode_cursor(cursor)
+                if not isinstance(after, int):
+                    raise ValueError(cursor)
+            except ValueError:
+                raise BadRequest("cursor", cursor)
+
         async with self.session() as session:
+            # 次ページの有無を判定するため1件多く取得する
             wallets = await self.repo.get_all(
-                session
+                session, limit=limit + 1, after=after
             )
-        return wallets
+        if len(wallets) <= limit:
+            return wallets, None
+        wallets = wallets[:limit]
+        return wallets, encode_cursor(
+            wallets[-1].wallet_id
+        )
 
 class GetWallet:
     def __init__(
         self,
-        session: AsyncSession,
+        session: AsyncReadSession,
         repo: WalletRepository,
     ) -> None:
         self.session = session
         self.repo = repo
 
     async def execute(
-        self, wallet_id: int,
+        self,
+        wallet_id: int,
+        include_histories: bool = False,
     ) -> Wallet:
         async with self.session() as session:
             wallet = await self.repo.get_by_id(
-                session, wallet_id
+                session,
+                wallet_id,
+                with_histories=include_histories,
             )
             if not wallet:
                 raise NotFound("wallet", wallet_id)
         return wallet
 
+class BatchGetWallets:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self,
+        wallet_ids: list[int],
+        include_histories: bool = False,
+        history_limit: int | None = None,
+    ) -> tuple[list[Wallet], list[int]]:
+        """取得できたWalletと存在しなかったIDを返す"""
+        wallet_ids = list(dict.fromkeys(wallet_ids))
+        async with self.session() as session:
+            wallets = await self.repo.get_many(
+                session,
+                wallet_ids,
+                with_histories=include_histories,
+                history_limit=history_limit,
+            )
+        found = {w.wallet_id for w in wallets}
+        return wallets, [
+            i for i in wallet_ids if i not in found
+        ]
+
+class GetWalletETag:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(self, wallet_id: int) -> str:
+        async with self.session() as session:
+            version = await self.repo.get_version(
+                session, wallet_id
+            )
+            if version is None:
+                raise NotFound("wallet", wallet_id)
+        return make_etag(wallet_id, version)
+
+class GetSummary:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self,
+        wallet_id: int,
+        granularity: Granularity,
+        since: date | None = None,
+        until: date | None = None,
+    ) -> list[Summary]:
+        async with self.session() as session:
+            if not await self.repo.exists(
+                session, wallet_id
+            ):
+                raise NotFound("wallet", wallet_id)
+            summaries = await self.repo.get_summary(
+                session,
+                wallet_id,
+                granularity,
+                since=since,
+                until=until,
+            )
+        return summaries
+
+class GetBalance:
+    def __init__(
+        self,
+        session: AsyncReadSession,
+        repo: WalletRepository,
+    ) -> None:
+        self.session = session
+        self.repo = repo
+
+    async def execute(
+        self, wallet_id: int, at: datetime
+    ) -> int:
+        async with self.session() as session:
+            balance = await self.repo.get_balance_at(
+                session, wallet_id, as_utc(at)
+            )
+        if balance is None:
+            raise NotFound("wallet", wallet_id)
+        return balance
+
 class CreateWallet:
     def __init__(
         self,
@@ -70,13 +198,11 @@ class UpdateWallet:
         self, wallet_id: int, name: str
     ) -> Wallet:
         async with self.session.begin() as session:
-            wallet = await self.repo.get_by_id(
-                session, wallet_id
+            wallet = await self.repo.update(
+                session, wallet_id, name
             )
             if not wallet:
                 raise NotFound("wallet", wallet_id)
-            wallet.name = name
-            await self.repo.update(session, wallet)
         return wallet
 
 class DeleteWallet:
@@ -92,8 +218,4 @@ class DeleteWallet:
         self, wallet_id: int
     ) -> None:
         async with self.session.begin() as session:
-            wallet = await self.repo.get_by_id(
-                session, wallet_id
-            )
-            if wallet:
-                await self.repo.delete(session, wallet)
+            await self.repo.delete(session, wallet_id)
@@ -1,10 +1,26 @@
+from datetime import date, datetime
 from typing import Annotated
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    Query,
+    Response,
+    status,
+)
+from app.models import Granularity
+from app.responses import FastJSONResponse, render
 from app.routes import LoggingRoute
+from app.utils.etag import etag_matches
 from .histories.views import (
     router as histories_router,
 )
 from .schemas import (
+    BatchGetWalletsRequest,
+    BatchGetWalletsResponse,
+    BatchGetWalletsResponseWithHistories,
+    GetBalanceResponse,
+    GetSummaryResponse,
     GetWalletResponse,
     GetWalletResponseWithHistories,
     GetWalletsResponse,
@@ -12,10 +28,13 @@ from .schemas import (
     PostWalletResponse,
     PutWalletRequest,
     PutWalletResponse,
-    Wallet,
 )
 from .use_cases import (
+    BatchGetWallets,
+    GetBalance,
     GetWallet,
+    GetWalletETag,
+    GetSummary,
     ListWallets,
     CreateWallet,
     UpdateWallet,
@@ -30,12 +49,49 @@ router = APIRouter(
 async def get_wallets(
     use_case: Annotated[
         ListWallets, Depends(ListWallets)
-    ]
-) -> GetWalletsResponse:
+    ],
+    limit: int = Query(
+        100, ge=1, le=1000, description="1ページの最大件数"
+    ),
+    cursor: str | None = Query(
+        None,
+        description="前ページのレスポンスのnext_cursor",
+    ),
+) -> FastJSONResponse:
     """Walletの一覧取得API"""
-    return GetWalletsResponse(
-        wallets=[Wallet.model_validate(w)
-            for w in await use_case.execute()]
+    wallets, next_cursor = await use_case.execute(
+        limit=limit, cursor=cursor
+    )
+    return render(
+        GetWalletsResponse,
+        {"wallets": wallets, "next_cursor": next_cursor},
+    )
+
+@router.post(
+    ":batchGet",
+    response_model=BatchGetWalletsResponseWithHistories
+    | BatchGetWalletsResponse,
+)
+async def batch_get_wallets(
+    data: BatchGetWalletsRequest,
+    use_case: Annotated[
+        BatchGetWallets, Depends(BatchGetWallets)
+    ],
+) -> FastJSONResponse:
+    """Walletの一括取得API
+
+    存在しないIDは404にせずmissing_idsで返す
+    """
+    wallets, missing_ids = await use_case.execute(
+        wallet_ids=data.wallet_ids,
+        include_histories=data.include_histories,
+        history_limit=data.history_limit,
+    )
+    return render(
+        BatchGetWalletsResponseWithHistories
+        if data.include_histories
+        else BatchGetWalletsResponse,
+        {"wallets": wallets, "missing_ids": missing_ids},
     )
 
 @router.get(
@@ -48,22 +104,104 @@ async def get_wallet(
     use_case: Annotated[
         GetWallet, Depends(GetWallet)
     ],
+    etag_use_case: Annotated[
+        GetWalletETag, Depends(GetWalletETag)
+    ],
     include_histories: bool = Query(
         False,
         description="収支項目一覧もレスポンスに含める場合はTrue",
     ),
-) -> GetWalletResponseWithHistories | GetWalletResponse:
-    """Walletの個別取得API"""
+    if_none_match: str | None = Header(None),
+) -> Response:
+    """Walletの個別取得API
+
+    If-None-MatchがETagと一致する場合は304を返す
+    """
+    # 本体より先にETagを決めるため、間に更新されても古いETagが付くだけで済む
+    etag = await etag_use_case.execute(wallet_id)
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
     result = await use_case.execute(
-        wallet_id=wallet_id
+        wallet_id=wallet_id,
+        include_histories=include_histories,
+    )
+    return render(
+        GetWalletResponseWithHistories
+        if include_histories else GetWalletResponse,
+        result,
+        headers={"ETag": etag},
+    )
+
+
+@router.get(
+    "/{wallet_id}/summary",
+    response_model=GetSummaryResponse,
+)
+async def get_summary(
+    wallet_id: int,
+    use_case: Annotated[
+        GetSummary, Depends(GetSummary)
+    ],
+    granularity: Granularity = Query(
+        Granularity.MONTH, description="集計の単位"
+    ),
+    since: date | None = Query(
+        None,
+        alias="from",
+        description="この日以降に始まる期間に絞り込む",
+    ),
+    until: date | None = Query(
+        None,
+        alias="to",
+        description="この日より前に始まる期間に絞り込む",
+    ),
+) -> FastJSONResponse:
+    """収支の集計取得API
+
+    日または月ごとの収入・支出・差引を期間の昇順で返す
+    """
+    return render(
+        GetSummaryResponse,
+        {
+            "granularity": granularity,
+            "summaries": await use_case.execute(
+                wallet_id=wallet_id,
+                granularity=granularity,
+                since=since,
+                until=until,
+            ),
+        },
+    )
+
+
+@router.get(
+    "/{wallet_id}/balance",
+    response_model=GetBalanceResponse,
+)
+async def get_balance(
+    wallet_id: int,
+    use_case: Annotated[
+        GetBalance, Depends(GetBalance)
+    ],
+    at: datetime = Query(
+        ..., description="この時刻（を含む）時点の予算を返す"
+    ),
+) -> GetBalanceResponse:
+    """過去時点の予算取得API
+
+    応答の at は UTCDatetime の検証でUTCに揃う
+    """
+    return GetBalanceResponse(
+        wallet_id=wallet_id,
+        at=at,
+        balance=await use_case.execute(
+            wallet_id=wallet_id, at=at
+        ),
     )
-    if include_histories:
-        return (
-            GetWalletResponseWithHistories.model_validate(
-                result
-            )
-        )
-    return GetWalletResponse.model_validate(result)
 
 
 @router.post(
@@ -0,0 +1,112 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from app.settings import Settings
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+class CacheBackend(ABC):
+    """キャッシュの保存先
+
+    値はbytesで受け渡すため、プロセス外のキャッシュサーバーも実装できる
+    """
+
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+class LocalCache(CacheBackend):
+    """プロセス内のLRUキャッシュ（TTL・件数上限・バイト数上限つき）"""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        max_bytes: int,
+    ) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[
+            str, tuple[float, bytes]
+        ] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._pop(key)
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[1]
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._pop(key)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = (
+            time.monotonic() + self.ttl, value
+        )
+        self.stats.entries += 1
+        self.stats.bytes += len(value)
+        while (
+            self.stats.entries > self.max_entries
+            or self.stats.bytes > self.max_bytes
+        ):
+            _, (_, evicted) = self._entries.popitem(
+                last=False
+            )
+            self.stats.entries -= 1
+            self.stats.bytes -= len(evicted)
+            self.stats.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._pop(key)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self.stats.entries = 0
+        self.stats.bytes = 0
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.stats.entries -= 1
+            self.stats.bytes -= len(entry[1])
+
+def create_cache(settings: Settings) -> CacheBackend | None:
+    if settings.cache_backend == "none":
+        return None
+    if settings.cache_backend == "local":
+        return LocalCache(
+            ttl=settings.cache_ttl,
+            max_entries=settings.cache_max_entries,
+            max_bytes=settings.cache_max_bytes,
+        )
+    raise ValueError(settings.cache_backend)
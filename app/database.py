@@ -1,42 +1,253 @@
 import logging
+import time
 from typing import Annotated, AsyncIterator
-from fastapi import Depends
-from sqlalchemy import Connection, inspect
+from fastapi import Depends, Header
+from sqlalchemy import Connection, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.cache import LocalCache, create_cache
 from app.exceptions import AppException
-from app.repositories import BaseORM
+from app.repositories import (
+    ApiKeyRepository as _ApiKeyRepository,
+)
+from app.repositories import CachedWalletRepository
+from app.repositories.cached import REPLICA
 from app.repositories import (
     WalletRepository as _WalletRepository,
 )
+from app.repositories import upgrade_schema
+from app.repositories.api_key import hash_api_key
+from app.settings import Settings, get_settings
 
 logger = logging.getLogger(__name__)
-async_engine = create_async_engine(
-    "sqlite+aiosqlite:///database.db",
+
+def _is_sqlite_file(settings: Settings) -> bool:
+    url = make_url(settings.database_url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database not in (None, "", ":memory:")
+    )
+
+def _set_sqlite_pragmas(
+    engine: AsyncEngine,
+    settings: Settings,
+    readonly: bool,
+) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # ドライバによる暗黙のBEGINを止め、下のbeginイベントで発行する
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        # histories の ON DELETE CASCADE を有効にする
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if not readonly:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(
+            f"PRAGMA busy_timeout={settings.sqlite_busy_timeout:d}"
+        )
+        cursor.execute(
+            f"PRAGMA cache_size={settings.sqlite_cache_size:d}"
+        )
+        cursor.execute(
+            f"PRAGMA mmap_size={settings.sqlite_mmap_size:d}"
+        )
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def on_begin(conn):
+        # 書き込みは最初に書き込みロックを取り、
+        # 読み取りからの昇格で "database is locked" になるのを防ぐ
+        conn.exec_driver_sql(
+            "BEGIN" if readonly else "BEGIN IMMEDIATE"
+        )
+
+def create_engine(settings: Settings) -> AsyncEngine:
+    url = make_url(settings.database_url)
+    if url.get_backend_name() != "sqlite":
+        connect_args = {}
+        if url.get_driver_name() == "asyncpg":
+            # timestamptzをUTCで受け取る
+            connect_args["server_settings"] = {
+                "timezone": "UTC"
+            }
+        return create_async_engine(
+            url,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_pre_ping=settings.database_pool_pre_ping,
+            connect_args=connect_args,
+        )
+
+    if not _is_sqlite_file(settings):
+        engine = create_async_engine(url)
+    else:
+        # 書き込みは常に1接続に集約し、SQLite内部のロック待ちを避ける
+        engine = create_async_engine(
+            url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+        )
+    _set_sqlite_pragmas(engine, settings, readonly=False)
+    return engine
+
+def create_read_engine(
+    settings: Settings,
+) -> AsyncEngine | None:
+    if settings.database_read_url:
+        return create_engine(
+            settings.model_copy(
+                update={
+                    "database_url": settings.database_read_url
+                }
+            )
+        )
+    # WALモードのSQLiteファイルでのみ、書き込みと並行して読める接続プールを作る
+    if not _is_sqlite_file(settings):
+        return None
+
+    url = make_url(settings.database_url)
+    url = url.set(
+        database=f"file:{url.database}",
+        query={**url.query, "mode": "ro", "uri": "true"},
+    )
+    engine = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0,
+    )
+    _set_sqlite_pragmas(engine, settings, readonly=True)
+    return engine
+
+async_engine = create_engine(get_settings())
+async_read_engine = (
+    create_read_engine(get_settings()) or async_engine
 )
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     autoflush=False,
 )
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine,
+    autoflush=False,
+    # 同じファイルを読むSQLiteの読み取り用プールは遅延しない
+    info={REPLICA: bool(get_settings().database_read_url)},
+)
+
+class RecentWrites:
+    """直近に書き込みをしたAPIキー（のハッシュ値）を一定時間だけ覚えておく
+
+    レプリカの遅延中に自分の書き込みが見えなくなるのを防ぐために使う
+    """
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self._until: dict[str, float] = {}
+        self._any_until = 0.0
 
-async def get_session() -> AsyncIterator[
-    async_sessionmaker
-]:
+    def mark(self, key: str) -> None:
+        if self.seconds <= 0:
+            return
+        now = time.monotonic()
+        if len(self._until) >= 10000:
+            self._until = {
+                k: v for k, v in self._until.items()
+                if v > now
+            }
+        self._until[key] = now + self.seconds
+        self._any_until = now + self.seconds
+
+    def any(self) -> bool:
+        """いずれかのキーの書き込みから一定時間以内か"""
+        return time.monotonic() < self._any_until
+
+    def __contains__(self, key: str) -> bool:
+        until = self._until.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._until[key]
+            return False
+        return True
+
+recent_writes = RecentWrites(
+    get_settings().read_your_writes_seconds
+)
+
+_API_KEY_HEADER = Header(
+    None, alias="APP-API-KEY", include_in_schema=False
+)
+
+async def get_session(
+    api_key: str | None = _API_KEY_HEADER,
+) -> AsyncIterator[async_sessionmaker]:
+    # 応答を受け取った直後のGETに間に合うよう処理の前後で記録する
+    # プロセス内にも平文のキーを残さないようハッシュ値で覚える
+    key_hash = hash_api_key(api_key) if api_key else None
+    if key_hash:
+        recent_writes.mark(key_hash)
     try:
         yield AsyncSessionLocal
     except SQLAlchemyError as e:
         logger.exception(e)
         raise AppException() from e
+    finally:
+        if key_hash:
+            recent_writes.mark(key_hash)
+
+async def get_read_session(
+    api_key: str | None = _API_KEY_HEADER,
+) -> AsyncIterator[async_sessionmaker]:
+    sessionmaker = AsyncReadSessionLocal
+    if api_key and hash_api_key(api_key) in recent_writes:
+        sessionmaker = AsyncSessionLocal
+    try:
+        yield sessionmaker
+    except SQLAlchemyError as e:
+        logger.exception(e)
+        raise AppException() from e
 
 AsyncSession = Annotated[
     async_sessionmaker, Depends(get_session)
 ]
 
+AsyncReadSession = Annotated[
+    async_sessionmaker, Depends(get_read_session)
+]
+
+cache = create_cache(get_settings())
+
+def get_wallet_repository() -> _WalletRepository:
+    if cache is None:
+        return _WalletRepository()
+    return CachedWalletRepository(
+        cache, replica_lagging=recent_writes.any
+    )
+
 WalletRepository = Annotated[
-    _WalletRepository, Depends(_WalletRepository)
+    _WalletRepository, Depends(get_wallet_repository)
+]
+
+# 検証済みAPIキーのハッシュ値（キャッシュの設定によらず常に使う）
+api_key_cache = LocalCache(
+    ttl=get_settings().api_key_cache_ttl,
+    max_entries=10000,
+    max_bytes=1048576,
+)
+
+def get_api_key_repository() -> _ApiKeyRepository:
+    return _ApiKeyRepository(api_key_cache)
+
+ApiKeyRepository = Annotated[
+    _ApiKeyRepository, Depends(get_api_key_repository)
 ]
 
 async def create_database_if_not_exist() -> None:
@@ -44,14 +255,20 @@ async def create_database_if_not_exist() -> None:
     def create_tables_if_not_exist(
         sync_conn: Connection,
     ) -> None:
-        if not inspect(sync_conn.engine).has_table(
-            "wallets"
-        ):
-            BaseORM.metadata.create_all(
-                sync_conn.engine
+        if sync_conn.dialect.name == "postgresql":
+            # 複数ワーカーが同時に起動しても作成は1回だけにする
+            sync_conn.execute(
+                text("SELECT pg_advisory_xact_lock(1)")
             )
+        # 書き込み用プールは1接続なので同じ接続上で作成する
+        upgrade_schema(sync_conn)
 
-    async with async_engine.connect() as conn:
+    async with async_engine.begin() as conn:
         await conn.run_sync(
             create_tables_if_not_exist
         )
+
+async def dispose_engines() -> None:
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
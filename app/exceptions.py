@@ -1,9 +1,11 @@
+import math
 from fastapi import FastAPI, Request, responses
 
 class AppException(Exception):
     status_code: int = 500
     message: str = "Internal Server Error"
     details: dict | None = None
+    headers: dict[str, str] | None = None
 
 class NotFound(AppException):
     status_code: int = 404
@@ -14,15 +16,39 @@ class NotFound(AppException):
     ) -> None:
         self.details = {resource: resource_id}
 
+class BadRequest(AppException):
+    status_code: int = 400
+    message: str = "Bad Request"
+
+    def __init__(
+        self, field: str, value: str
+    ) -> None:
+        self.details = {field: value}
+
+class TooManyRequests(AppException):
+    status_code: int = 429
+    message: str = "Too Many Requests"
+
+    def __init__(self, retry_after: float) -> None:
+        self.headers = {
+            "Retry-After": str(max(1, math.ceil(retry_after)))
+        }
+
+def exception_response(
+    exc: AppException,
+) -> responses.JSONResponse:
+    content = {"message": exc.message}
+    if exc.details:
+        content["details"] = exc.details
+    return responses.JSONResponse(
+        status_code=exc.status_code,
+        content=content,
+        headers=exc.headers,
+    )
+
 def init_exception_handler(app: FastAPI):
     @app.exception_handler(AppException)
     async def app_exception_handler(
         req: Request, exc: AppException
     ):
-        content = {"message": exc.message}
-        if exc.details:
-            content["details"] = exc.details
-        return responses.JSONResponse(
-            status_code=exc.status_code,
-            content=content,
-        )
+        return exception_response(exc)
@@ -1,11 +1,21 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 def init_log(
     name: str = "app", log_level: str = "INFO"
 ) -> None:
-    logger = logging.getLogger(name)
     handler = logging.StreamHandler()
     handler.setFormatter(
         logging.Formatter("%(message)s"))
-    logger.addHandler(handler)
+    # 出力は別スレッドのリスナーが行い、イベントループを止めない
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger = logging.getLogger(name)
+    logger.addHandler(QueueHandler(log_queue))
     logger.setLevel(log_level)
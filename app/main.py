@@ -1,21 +1,30 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from app.api import router as api_router
-from app.database import create_database_if_not_exist
+from fastapi import Depends, FastAPI
+from app.api import get_admin_key, router as api_router
+from app.database import (
+    create_database_if_not_exist,
+    dispose_engines,
+)
 from app.exceptions import init_exception_handler
 from app.log import init_log
+from app.metrics import router as metrics_router
 from app.middlewares import init_middlewares
+from app.settings import get_settings
 
 @asynccontextmanager
 async def lifespan(app_: FastAPI):
     await create_database_if_not_exist()
     yield
+    await dispose_engines()
 
 app = FastAPI(
     title="MyWallets API", lifespan=lifespan
 )
 
-init_log()
+init_log(log_level=get_settings().log_level)
 init_exception_handler(app)
 init_middlewares(app)
 app.include_router(api_router, prefix="/api")
+app.include_router(
+    metrics_router, dependencies=[Depends(get_admin_key)]
+)
@@ -0,0 +1,264 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Iterator
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app import database
+
+# 記録はイベントループ上でawaitを挟まずに行うため、ロックは不要
+LabelValues = tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+def _format_labels(
+    names: tuple[str, ...], values: LabelValues
+) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{n}="{_escape(v)}"' for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+class Metric(ABC):
+    type_: str = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """ラベルの組ごとのサンプル行"""
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_}"
+        yield from self.samples()
+
+class _Values(Metric):
+    """ラベルの組ごとに1つの値を持つメトリクス"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.values: defaultdict[
+            LabelValues, float
+        ] = defaultdict(float)
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield (
+                f"{self.name}"
+                f"{_format_labels(self.labels, labels)}"
+                f" {value:g}"
+            )
+
+class Gauge(_Values):
+    type_ = "gauge"
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        self.values[labels] += value
+
+    def dec(self, *labels: str, value: float = 1) -> None:
+        self.values[labels] -= value
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+class Counter(_Values):
+    """単調増加する値"""
+    type_ = "counter"
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        if value < 0:
+            raise ValueError("counters can only increase")
+        self.values[labels] += value
+
+class Histogram(Metric):
+    type_ = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = (),
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+        # バケットごとの件数（累積ではない）と合計値
+        self.counts: dict[LabelValues, list[int]] = {}
+        self.sums: defaultdict[
+            LabelValues, float
+        ] = defaultdict(float)
+
+    def observe(self, *labels: str, value: float) -> None:
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (
+                len(self.buckets) + 1
+            )
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def samples(self) -> Iterator[str]:
+        names = self.labels + ("le",)
+        for labels, counts in self.counts.items():
+            total = 0
+            for bound, count in zip(
+                (*self.buckets, float("inf")), counts
+            ):
+                total += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_format_labels(names, (*labels, le))}"
+                    f" {total}"
+                )
+            suffix = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{suffix} {self.sums[labels]:g}"
+            yield f"{self.name}_count{suffix} {total}"
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func: Callable[[], None]):
+        """収集時に呼び出し、外部の値をメトリクスへ反映する関数を登録する"""
+        self.collectors.append(func)
+        return func
+
+    def expose(self) -> str:
+        for collect in self.collectors:
+            collect()
+        return "\n".join(
+            line
+            for metric in self.metrics
+            for line in metric.expose()
+        ) + "\n"
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total",
+    "Total HTTP requests.",
+    ("method", "route", "status"),
+))
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds.",
+    ("method", "route"),
+    buckets=(
+        0.005, 0.01, 0.025, 0.05, 0.1,
+        0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    ),
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size in bytes.",
+    ("method", "route"),
+    buckets=(
+        100, 1000, 10000, 100000,
+        1000000, 10000000,
+    ),
+))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed.",
+    ("method", "route"),
+))
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "db_pool_checked_out",
+    "Database connections currently in use.",
+    ("engine",),
+))
+DB_POOL_SIZE = registry.register(Gauge(
+    "db_pool_size",
+    "Database connection pool size.",
+    ("engine",),
+))
+DB_POOL_OVERFLOW = registry.register(Gauge(
+    "db_pool_overflow",
+    "Database connections opened beyond the pool size.",
+    ("engine",),
+))
+CACHE_REQUESTS = registry.register(Counter(
+    "cache_requests_total",
+    "Cache lookups.",
+    ("result",),
+))
+CACHE_EVICTIONS = registry.register(Counter(
+    "cache_evictions_total",
+    "Cache entries evicted by the size limits.",
+))
+CACHE_ENTRIES = registry.register(Gauge(
+    "cache_entries", "Cache entries currently stored.",
+))
+CACHE_BYTES = registry.register(Gauge(
+    "cache_bytes", "Bytes currently stored in the cache.",
+))
+
+def _catch_up(counter: Counter, *labels: str, total: float) -> None:
+    # 他のオブジェクトが持つ累計値との差分だけ増やす
+    current = counter.values[labels]
+    if total > current:
+        counter.inc(*labels, value=total - current)
+
+@registry.collector
+def _collect_database() -> None:
+    engines = {"primary": database.async_engine}
+    if database.async_read_engine is not database.async_engine:
+        engines["read"] = database.async_read_engine
+    for name, engine in engines.items():
+        pool = engine.sync_engine.pool
+        # StaticPoolなどは接続数を持たない
+        if not hasattr(pool, "checkedout"):
+            continue
+        DB_POOL_CHECKED_OUT.set(name, value=pool.checkedout())
+        DB_POOL_SIZE.set(name, value=pool.size())
+        DB_POOL_OVERFLOW.set(name, value=max(pool.overflow(), 0))
+
+@registry.collector
+def _collect_cache() -> None:
+    if database.cache is None:
+        return
+    stats = database.cache.stats
+    _catch_up(CACHE_REQUESTS, "hit", total=stats.hits)
+    _catch_up(CACHE_REQUESTS, "miss", total=stats.misses)
+    _catch_up(CACHE_EVICTIONS, total=stats.evictions)
+    CACHE_ENTRIES.set(value=stats.entries)
+    CACHE_BYTES.set(value=stats.bytes)
+
+router = APIRouter()
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def get_metrics() -> PlainTextResponse:
+    """Prometheusのテキスト形式でメトリクスを返す
+
+    接続プールやキャッシュの状態を含むため、管理用のキーを要求する
+    """
+    return PlainTextResponse(
+        registry.expose(),
+        media_type="text/plain; version=0.0.4",
+    )
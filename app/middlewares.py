@@ -1,15 +1,107 @@
 import logging
-from app.utils.datetime import utcnow
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app import query_stats
+from app.database import api_key_cache
+from app.metrics import (
+    REQUESTS,
+    REQUEST_DURATION,
+    RESPONSE_SIZE,
+)
+from app.rate_limit import (
+    RateLimitMiddleware,
+    create_rate_limiter,
+)
+from app.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+def _route_template(scope: Scope) -> str:
+    # 生のURLではなくルートのパスで集計し、ラベルの種類を抑える
+    # ルーティング後にRouterがscopeへ設定したルートを読む
+    route = scope.get("route")
+    return getattr(route, "path", "<unmatched>")
+
+class AccessLogMiddleware:
+    """リクエストの計測とアクセスログ
+
+    BaseHTTPMiddlewareと異なりタスクやストリームを挟まず、
+    送信されるメッセージを覗くだけなのでレスポンスをバッファしない
+    """
+
+    def __init__(
+        self, app: ASGIApp, duplicate_threshold: int = 0
+    ) -> None:
+        self.app = app
+        self.duplicate_threshold = duplicate_threshold
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = query_stats.start()
+        st = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # 本文の送信中に実行されるSQLはアクセスログにだけ含まれる
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    f"{stats.server_timing()}, app;dur="
+                    f"{(time.perf_counter() - st) * 1000:.1f}",
+                )
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 本文を送り終えた時点で記録する
+            elapsed = time.perf_counter() - st
+            route = _route_template(scope)
+            REQUESTS.inc(method, route, str(status))
+            REQUEST_DURATION.observe(
+                method, route, value=elapsed)
+            RESPONSE_SIZE.observe(method, route, value=size)
+            logger.info(
+                "%s %s %d %.1fms db=%d/%.1fms "
+                "slowest=%.1fms %s",
+                method, scope["path"], status,
+                elapsed * 1000, stats.count,
+                stats.duration * 1000, stats.slowest * 1000,
+                stats.slowest_statement[:200])
+            if self.duplicate_threshold:
+                for statement, count in stats.duplicates(
+                    self.duplicate_threshold
+                ).items():
+                    logger.warning(
+                        "statement ran %d times in %s %s: %s",
+                        count, method, route, statement)
+
+rate_limiter = create_rate_limiter(get_settings())
+
 def init_middlewares(app) -> None:
-    @app.middleware("http")
-    async def log_middleware(request, call_next):
-        st = utcnow()
-        response = await call_next(request)
-        et = utcnow()
-        logger.info(
-            "processing time: %f",
-            (et - st).total_seconds())
-        return response
+    # 横断的な処理は純粋なASGIミドルウェアとして追加する
+    # 後に追加したものほど外側で動くため、制限した応答もログに残る
+    if rate_limiter is not None:
+        app.add_middleware(
+            RateLimitMiddleware,
+            backend=rate_limiter,
+            settings=get_settings(),
+            verified=api_key_cache,
+        )
+    app.add_middleware(
+        AccessLogMiddleware,
+        duplicate_threshold=(
+            get_settings().debug_duplicate_queries),
+    )
@@ -1,12 +1,15 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import StrEnum
 from typing import Annotated
 from pydantic import BaseModel as _BaseModel
 from pydantic import ConfigDict, PositiveInt
-from pydantic import WrapSerializer
-from app.utils.datetime import to_utc
+from pydantic import AfterValidator, WrapSerializer
+from app.utils.datetime import as_utc, to_utc
 
-UTCDatetime = Annotated[datetime, WrapSerializer(to_utc)]
+# SQLiteはオフセットを保存しないため、受け取った時点でUTCに揃える
+UTCDatetime = Annotated[
+    datetime, AfterValidator(as_utc), WrapSerializer(to_utc)
+]
 
 class BaseModel(_BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -15,24 +18,45 @@ class HistoryType(StrEnum):
     INCOME = "INCOME"
     OUTCOME = "OUTCOME"
 
-class History(BaseModel):
-    history_id: int
+    def signed(self, amount: int) -> int:
+        """残高に対する増減（支出は負の値）"""
+        if self == HistoryType.INCOME:
+            return amount
+        return -amount
+
+class NewHistory(BaseModel):
     name: str
     amount: PositiveInt
     type: HistoryType
     history_at: UTCDatetime
+
+class Granularity(StrEnum):
+    DAY = "day"
+    MONTH = "month"
+
+class History(NewHistory):
+    history_id: int
     wallet_id: int
 
-class Wallet(BaseModel):
+class WalletSummary(BaseModel):
     wallet_id: int
     name: str
-    histories: list[History]
+    balance: int
+
+class Wallet(WalletSummary):
+    histories: list[History] = []
+
+class ApiKey(BaseModel):
+    api_key_id: int
+    name: str
+    created_at: UTCDatetime
+    revoked_at: UTCDatetime | None
+
+class Summary(BaseModel):
+    bucket: date
+    income: int
+    outcome: int
 
     @property
-    def balance(self) -> int:
-        return sum(
-            h.amount
-            if h.type == HistoryType.INCOME
-            else -h.amount
-            for h in self.histories
-        )
+    def net(self) -> int:
+        return self.income - self.outcome
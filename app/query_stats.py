@@ -0,0 +1,65 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+@dataclass
+class QueryStats:
+    """1リクエストで実行したSQLの集計"""
+    count: int = 0
+    duration: float = 0.0  # 秒
+    slowest: float = 0.0
+    slowest_statement: str = ""
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+        if duration > self.slowest:
+            self.slowest = duration
+            self.slowest_statement = statement
+
+    def duplicates(self, threshold: int) -> dict[str, int]:
+        """threshold 回を超えて実行したSQLとその回数"""
+        return {
+            statement: count
+            for statement, count in self.statements.items()
+            if count > threshold
+        }
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.duration * 1000:.1f};'
+            f'desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest * 1000:.1f}"
+        )
+
+_current: ContextVar[QueryStats | None] = ContextVar(
+    "query_stats", default=None
+)
+
+def start() -> QueryStats:
+    """以降に同じコンテキストで実行されるSQLを集計する"""
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    if context is not None and _current.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    stats = _current.get()
+    started_at = getattr(context, "_query_started_at", None)
+    if stats is None or started_at is None:
+        return
+    stats.record(statement, time.perf_counter() - started_at)
@@ -0,0 +1,218 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.cache import CacheBackend
+from app.exceptions import TooManyRequests, exception_response
+from app.repositories.api_key import hash_api_key
+from app.settings import Settings
+
+class RateLimitBackend(ABC):
+    """レート制限の状態の保存先
+
+    複数ワーカーで制限を共有する場合はプロセス外の保存先を実装する
+    """
+
+    @abstractmethod
+    async def acquire(
+        self, key: str, rate: float, burst: int, cost: int = 1
+    ) -> float:
+        """トークンを cost 個消費する
+
+        消費できれば0を、できなければ次に消費できるまでの秒数を返す
+        """
+
+    @abstractmethod
+    async def enter(self, key: str, limit: int) -> bool:
+        """同時実行数を1つ増やす（上限に達していればFalse）"""
+
+    @abstractmethod
+    async def leave(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+class LocalRateLimiter(RateLimitBackend):
+    """プロセス内のトークンバケット
+
+    キーごとに (トークン数, 更新時刻) だけを持ち、古いキーから捨てる
+    捨てたキーのバケットは満杯に戻る
+    """
+
+    def __init__(
+        self,
+        max_keys: int = 100000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[
+            str, tuple[float, float]
+        ] = OrderedDict()
+        self._running: dict[str, int] = {}
+
+    async def acquire(
+        self, key: str, rate: float, burst: int, cost: int = 1
+    ) -> float:
+        now = self.clock()
+        tokens, updated_at = self._buckets.pop(
+            key, (burst, now)
+        )
+        tokens = min(
+            burst, tokens + (now - updated_at) * rate
+        )
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def enter(self, key: str, limit: int) -> bool:
+        running = self._running.get(key, 0)
+        if running >= limit:
+            return False
+        self._running[key] = running + 1
+        return True
+
+    async def leave(self, key: str) -> None:
+        running = self._running.pop(key, 0) - 1
+        if running > 0:
+            self._running[key] = running
+
+    async def clear(self) -> None:
+        self._buckets.clear()
+        self._running.clear()
+
+def create_rate_limiter(
+    settings: Settings,
+) -> RateLimitBackend | None:
+    if settings.rate_limit_backend == "none":
+        return None
+    if settings.rate_limit_backend == "local":
+        return LocalRateLimiter()
+    raise ValueError(settings.rate_limit_backend)
+
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# POSTでも読み取りだけを行うカスタムメソッド
+_READ_SUFFIXES = (":batchGet",)
+
+@dataclass
+class Bucket:
+    """リクエストに割り当てたトークンバケット"""
+    backend: RateLimitBackend
+    key: str
+    rate: float
+    burst: int
+
+    async def acquire(self, cost: int = 1) -> float:
+        # burstを超える量は一度に消費できないため、満杯のバケット全体で頭打ちにする
+        return await self.backend.acquire(
+            self.key, self.rate, self.burst, min(cost, self.burst)
+        )
+
+async def consume(request: Request, cost: int) -> None:
+    """ミドルウェアが割り当てたバケットから追加でトークンを消費する
+
+    1リクエストで複数の操作を行うAPIが、操作数に応じて数えるために使う
+    """
+    bucket = getattr(request.state, "rate_limit", None)
+    if bucket is None or cost <= 0:
+        return
+    wait = await bucket.acquire(cost)
+    if wait:
+        raise TooManyRequests(wait)
+
+class RateLimitMiddleware:
+    """APIキーごとのレート制限と同時実行数の制限
+
+    読み取りと書き込みは別のバケットで数える
+    キーは平文ではなくハッシュ値で保持し、verified を渡した場合は
+    まだ検証していないキーを小さな別のバケットで数える
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        backend: RateLimitBackend,
+        settings: Settings,
+        verified: CacheBackend | None = None,
+    ) -> None:
+        self.app = app
+        self.backend = backend
+        self.settings = settings
+        self.verified = verified
+
+    async def _bucket(self, scope: Scope, key_hash: str) -> Bucket:
+        settings = self.settings
+        if (
+            self.verified is not None
+            and await self.verified.get(key_hash) is None
+        ):
+            # 検証の期限が切れたキーも、次の認証で検証し直されるまではここで数える
+            return Bucket(
+                self.backend,
+                f"{key_hash}:unverified",
+                settings.rate_limit_unverified_per_second,
+                settings.rate_limit_unverified_burst,
+            )
+        if (
+            scope["method"] in _READ_METHODS
+            or scope["path"].endswith(_READ_SUFFIXES)
+        ):
+            return Bucket(
+                self.backend,
+                f"{key_hash}:read",
+                settings.rate_limit_read_per_second,
+                settings.rate_limit_read_burst,
+            )
+        return Bucket(
+            self.backend,
+            f"{key_hash}:write",
+            settings.rate_limit_write_per_second,
+            settings.rate_limit_write_burst,
+        )
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        api_key = None
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"app-api-key":
+                    api_key = value.decode("latin-1")
+                    break
+        # キーのないリクエストは認証で拒否される
+        if api_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = hash_api_key(api_key)
+        bucket = await self._bucket(scope, client)
+        wait = await bucket.acquire()
+        if wait:
+            await exception_response(TooManyRequests(wait))(
+                scope, receive, send)
+            return
+        scope.setdefault("state", {})["rate_limit"] = bucket
+
+        limit = self.settings.rate_limit_concurrency
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+        if not await self.backend.enter(client, limit):
+            await exception_response(TooManyRequests(1))(
+                scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.backend.leave(client)
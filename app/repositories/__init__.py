@@ -1 +1,4 @@
 from .wallet import BaseORM, WalletRepository
+from .cached import CachedWalletRepository
+from .api_key import ApiKeyRepository
+from .migration import upgrade_schema
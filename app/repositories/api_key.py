@@ -0,0 +1,110 @@
+import hashlib
+import secrets
+from datetime import datetime
+from sqlalchemy import DateTime, String, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from app.cache import CacheBackend
+from app.models import ApiKey
+from app.utils.datetime import utcnow
+from .wallet import BaseORM
+
+def hash_api_key(key: str) -> str:
+    # キーは十分な長さの乱数なので、低速なハッシュ関数は不要
+    return hashlib.sha256(key.encode()).hexdigest()
+
+class ApiKeyORM(BaseORM):
+    """APIキー（平文は保存せずハッシュ値だけを持つ）"""
+    __tablename__ = "api_keys"
+    api_key_id: Mapped[int] = mapped_column(
+        primary_key=True
+    )
+    name: Mapped[str]
+    key_hash: Mapped[str] = mapped_column(
+        String(64), unique=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    revoked_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True)
+    )
+
+    def to_entity(self) -> ApiKey:
+        return ApiKey.model_validate(self)
+
+class ApiKeyRepository:
+    """APIキーの保存と検証
+
+    検証済みのハッシュ値は cache にTTLの間だけ保持する
+    他のプロセスでの失効はTTL以内に反映される
+    """
+
+    def __init__(
+        self, cache: CacheBackend | None = None
+    ) -> None:
+        self.cache = cache
+
+    async def add(
+        self, session: AsyncSession, name: str
+    ) -> tuple[ApiKey, str]:
+        """APIキーを発行し、エンティティと平文のキーを返す"""
+        key = secrets.token_urlsafe(32)
+        api_key = ApiKeyORM(
+            name=name, key_hash=hash_api_key(key)
+        )
+        session.add(api_key)
+        await session.flush()
+        return api_key.to_entity(), key
+
+    async def get_all(
+        self, session: AsyncSession
+    ) -> list[ApiKey]:
+        stmt = select(ApiKeyORM).order_by(
+            ApiKeyORM.api_key_id
+        )
+        return [
+            k.to_entity()
+            for k in await session.scalars(stmt)
+        ]
+
+    async def revoke(
+        self, session: AsyncSession, api_key_id: int
+    ) -> bool:
+        stmt = (
+            update(ApiKeyORM)
+            .where(
+                ApiKeyORM.api_key_id == api_key_id,
+                ApiKeyORM.revoked_at.is_(None),
+            )
+            .values(revoked_at=utcnow())
+            .returning(ApiKeyORM.key_hash)
+        )
+        key_hash = await session.scalar(stmt)
+        if key_hash is None:
+            return False
+        if self.cache is not None:
+            await self.cache.delete(key_hash)
+        return True
+
+    async def verify(
+        self, session: AsyncSession, key: str
+    ) -> bool:
+        key_hash = hash_api_key(key)
+        if (
+            self.cache is not None
+            and await self.cache.get(key_hash) is not None
+        ):
+            return True
+        # ハッシュ値で引くため、比較の時間差から平文のキーは推測できない
+        stored = await session.scalar(
+            select(ApiKeyORM.key_hash).where(
+                ApiKeyORM.key_hash == key_hash,
+                ApiKeyORM.revoked_at.is_(None),
+            )
+        )
+        if stored is None:
+            return False
+        if self.cache is not None:
+            await self.cache.set(key_hash, b"1")
+        return True
@@ -0,0 +1,250 @@
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+from app.cache import CacheBackend
+from app.models import (
+    History,
+    HistoryType,
+    NewHistory,
+    Wallet,
+)
+from .wallet import WalletRepository
+
+_PENDING_INVALIDATIONS = "cache_invalidations"
+# 遅延のあるレプリカに接続するセッションの info に設定する
+REPLICA = "replica"
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    # コミット前に並行リクエストが古い値を入れ直していても消えるよう、
+    # コミット後にもう一度削除する
+    # AsyncSessionのコミットはgreenlet上で実行されるため、削除の完了を待ち、
+    # 失敗はコミットの呼び出し元へ伝える
+    for cache, keys in session.info.pop(
+        _PENDING_INVALIDATIONS, []
+    ):
+        await_only(cache.delete(*keys))
+
+def _version_key(wallet_id: int) -> str:
+    return f"wallet:{wallet_id}:version"
+
+class CachedWalletRepository(WalletRepository):
+    """読み取り結果をキャッシュするWalletRepository
+
+    エントリのキーにWalletのversionを含めるため、書き込み時に
+    versionのエントリを消せばそのWalletのエントリはすべて参照されなくなる
+    """
+
+    def __init__(
+        self,
+        cache: CacheBackend,
+        replica_lagging: Callable[[], bool] = lambda: False,
+    ) -> None:
+        self.cache = cache
+        self.replica_lagging = replica_lagging
+
+    async def _set(
+        self, session: AsyncSession, key: str, value: bytes
+    ) -> None:
+        # 書き込み直後のレプリカから読んだ古い値はTTLの間残り続けるため保存しない
+        if session.info.get(REPLICA) and self.replica_lagging():
+            return
+        await self.cache.set(key, value)
+
+    async def get_version(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+    ) -> int | None:
+        cached = await self.cache.get(_version_key(wallet_id))
+        if cached is not None:
+            return int(cached)
+        version = await super().get_version(
+            session, wallet_id
+        )
+        if version is not None:
+            await self._set(
+                session,
+                _version_key(wallet_id),
+                str(version).encode(),
+            )
+        return version
+
+    async def get_by_id(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        with_histories: bool = False,
+    ) -> Wallet | None:
+        version = await self.get_version(session, wallet_id)
+        if version is None:
+            return None
+        key = f"wallet:{wallet_id}:{version}:{int(with_histories)}"
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return Wallet.model_validate_json(cached)
+        wallet = await super().get_by_id(
+            session, wallet_id, with_histories
+        )
+        if wallet:
+            await self._set(
+                session, key, wallet.model_dump_json().encode()
+            )
+        return wallet
+
+    async def get_history_by_id(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+    ) -> History | None:
+        version = await self.get_version(session, wallet_id)
+        if version is None:
+            return None
+        key = f"history:{wallet_id}:{version}:{history_id}"
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return History.model_validate_json(cached)
+        history = await super().get_history_by_id(
+            session, wallet_id, history_id
+        )
+        if history:
+            await self._set(
+                session, key, history.model_dump_json().encode()
+            )
+        return history
+
+    async def update(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        name: str,
+    ) -> Wallet | None:
+        wallet = await super().update(session, wallet_id, name)
+        await self._invalidate(session, wallet_id)
+        return wallet
+
+    async def delete(
+        self, session: AsyncSession, wallet_id: int
+    ) -> bool:
+        deleted = await super().delete(session, wallet_id)
+        await self._invalidate(session, wallet_id)
+        return deleted
+
+    async def add_history(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        name: str,
+        amount: int,
+        type_: HistoryType,
+        history_at: datetime,
+    ) -> History | None:
+        history = await super().add_history(
+            session,
+            wallet_id,
+            name=name,
+            amount=amount,
+            type_=type_,
+            history_at=history_at,
+        )
+        await self._invalidate(session, wallet_id)
+        return history
+
+    async def add_histories(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        histories: list[NewHistory],
+    ) -> list[int]:
+        history_ids = await super().add_histories(
+            session, wallet_id, histories
+        )
+        await self._invalidate(session, wallet_id)
+        return history_ids
+
+    async def update_history(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+        name: str,
+        amount: int,
+        type_: HistoryType,
+        history_at: datetime,
+    ) -> History | None:
+        history = await super().update_history(
+            session,
+            wallet_id,
+            history_id,
+            name=name,
+            amount=amount,
+            type_=type_,
+            history_at=history_at,
+        )
+        await self._invalidate(session, wallet_id)
+        return history
+
+    async def move_history(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+        destination_id: int,
+    ) -> History | None:
+        history = await super().move_history(
+            session,
+            wallet_id,
+            history_id,
+            destination_id=destination_id,
+        )
+        await self._invalidate(
+            session, wallet_id, destination_id
+        )
+        return history
+
+    async def move_histories(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        destination_id: int,
+        history_ids: list[int] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> int:
+        moved = await super().move_histories(
+            session,
+            wallet_id,
+            destination_id,
+            history_ids=history_ids,
+            since=since,
+            until=until,
+        )
+        await self._invalidate(
+            session, wallet_id, destination_id
+        )
+        return moved
+
+    async def delete_history(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+    ) -> bool:
+        deleted = await super().delete_history(
+            session, wallet_id, history_id
+        )
+        await self._invalidate(session, wallet_id)
+        return deleted
+
+    async def _invalidate(
+        self, session: AsyncSession, *wallet_ids: int
+    ) -> None:
+        keys = [_version_key(i) for i in wallet_ids]
+        await self.cache.delete(*keys)
+        session.info.setdefault(
+            _PENDING_INVALIDATIONS, []
+        ).append((self.cache, keys))
@@ -0,0 +1,169 @@
+from datetime import datetime, timezone
+from sqlalchemy import (
+    Connection,
+    case,
+    func,
+    insert,
+    inspect,
+    literal,
+    select,
+    text,
+    update,
+)
+from app.models import Granularity, HistoryType
+from app.utils.datetime import as_utc
+from .wallet import (
+    BaseORM,
+    BalanceSnapshotORM,
+    HistoryORM,
+    RollupORM,
+    WalletORM,
+    bucket_column,
+)
+
+def _backfill_rollups(conn: Connection) -> None:
+    rollups = RollupORM.__table__
+    for granularity in Granularity:
+        bucket = bucket_column(conn.dialect.name, granularity)
+        conn.execute(
+            insert(rollups).from_select(
+                [
+                    "wallet_id", "granularity", "bucket",
+                    "type", "amount", "count",
+                ],
+                select(
+                    HistoryORM.wallet_id,
+                    literal(
+                        granularity, rollups.c.granularity.type
+                    ),
+                    bucket,
+                    HistoryORM.type,
+                    func.sum(HistoryORM.amount),
+                    func.count(),
+                ).group_by(
+                    HistoryORM.wallet_id, bucket, HistoryORM.type
+                ),
+            )
+        )
+
+def _backfill_balances(conn: Connection) -> None:
+    totals = (
+        select(
+            HistoryORM.wallet_id,
+            func.sum(
+                case(
+                    (
+                        HistoryORM.type == HistoryType.INCOME,
+                        HistoryORM.amount,
+                    ),
+                    else_=-HistoryORM.amount,
+                )
+            ).label("balance"),
+        )
+        .group_by(HistoryORM.wallet_id)
+        .subquery()
+    )
+    conn.execute(
+        update(WalletORM.__table__)
+        .values(balance=totals.c.balance)
+        .where(WalletORM.wallet_id == totals.c.wallet_id)
+    )
+
+def _backfill_snapshots(conn: Connection) -> None:
+    """収支項目のある各月の月初のスナップショットのうち無いものを作成する"""
+    month = bucket_column(conn.dialect.name, Granularity.MONTH)
+    totals = conn.execute(
+        select(
+            HistoryORM.wallet_id,
+            month,
+            func.sum(HistoryORM.signed_amount),
+        )
+        .group_by(HistoryORM.wallet_id, month)
+        .order_by(HistoryORM.wallet_id, month)
+    ).all()
+    existing = {
+        (wallet_id, as_utc(snapshot_at))
+        for wallet_id, snapshot_at in conn.execute(
+            select(
+                BalanceSnapshotORM.wallet_id,
+                BalanceSnapshotORM.snapshot_at,
+            )
+        )
+    }
+    rows = []
+    balances: dict[int, int] = {}
+    for wallet_id, bucket, amount in totals:
+        snapshot_at = datetime(
+            bucket.year, bucket.month, 1, tzinfo=timezone.utc
+        )
+        # 月初時点の残高 = それより前の月の収支の合計
+        balance = balances.get(wallet_id, 0)
+        if (wallet_id, snapshot_at) not in existing:
+            rows.append({
+                "wallet_id": wallet_id,
+                "snapshot_at": snapshot_at,
+                "balance": balance,
+            })
+        balances[wallet_id] = balance + amount
+    for i in range(0, len(rows), 1000):
+        conn.execute(
+            insert(BalanceSnapshotORM.__table__), rows[i:i + 1000]
+        )
+
+def upgrade_schema(conn: Connection) -> None:
+    """テーブルを作成し、既存のDBを現在のスキーマに合わせる
+
+    後から追加した列・索引・集計テーブルと、各月初のスナップショットを
+    既存のデータから埋める
+    """
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    BaseORM.metadata.create_all(conn)
+    if "wallets" not in tables:
+        return
+
+    columns = {
+        column["name"]: column
+        for column in inspector.get_columns("wallets")
+    }
+    if "version" not in columns:
+        conn.execute(text(
+            "ALTER TABLE wallets ADD COLUMN "
+            "version INTEGER NOT NULL DEFAULT 1"
+        ))
+    if "balance" not in columns:
+        conn.execute(text(
+            "ALTER TABLE wallets ADD COLUMN "
+            "balance INTEGER NOT NULL DEFAULT 0"
+        ))
+        _backfill_balances(conn)
+
+    history_at = next(
+        column for column in inspector.get_columns("histories")
+        if column["name"] == "history_at"
+    )
+    if (
+        conn.dialect.name == "postgresql"
+        and not getattr(history_at["type"], "timezone", False)
+    ):
+        # タイムゾーンなしで保存していた値はUTCとして読み替える
+        conn.execute(text(
+            "ALTER TABLE histories ALTER COLUMN history_at "
+            "TYPE TIMESTAMP WITH TIME ZONE "
+            "USING history_at AT TIME ZONE 'UTC'"
+        ))
+
+    indexes = {
+        index["name"] for index in inspector.get_indexes("histories")
+    }
+    for index in HistoryORM.__table__.indexes:
+        if index.name not in indexes:
+            index.create(conn)
+    # 複合索引の先頭列と重複する wallet_id だけの索引は不要
+    if "ix_histories_wallet_id" in indexes:
+        conn.execute(text("DROP INDEX ix_histories_wallet_id"))
+
+    if "rollups" not in tables:
+        _backfill_rollups(conn)
+    # 書き込み時に作成されなかった月のスナップショットも補う
+    _backfill_snapshots(conn)
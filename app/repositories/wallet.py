@@ -1,8 +1,13 @@
-from datetime import datetime
+from collections import Counter
+from collections.abc import AsyncIterator, Iterable
+from datetime import date, datetime, time, timezone
 from sqlalchemy import (
     CheckConstraint,
+    Date,
+    DateTime,
     Enum,
     ForeignKey,
+    Index,
     Integer,
 )
 from sqlalchemy.orm import (
@@ -11,18 +16,49 @@ from sqlalchemy.orm import (
     mapped_column,
     relationship,
 )
-from app.models import HistoryType
-from sqlalchemy import select
+from app.models import Granularity, HistoryType
+from sqlalchemy import (
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload, joinedload
-from app.exceptions import AppException
-from app.models import History, Wallet
+from sqlalchemy.ext.hybrid import hybrid_property
+from app.models import (
+    History,
+    NewHistory,
+    Summary,
+    Wallet,
+    WalletSummary,
+)
+from app.utils.datetime import (
+    as_utc,
+    month_start,
+    next_month_start,
+    utcnow,
+)
 
 class BaseORM(DeclarativeBase):
     pass
 
 class HistoryORM(BaseORM):
     __tablename__ = "histories"
+    # wallet単位の期間絞り込みと history_at 順の並び替えを索引だけで処理する
+    __table_args__ = (
+        Index(
+            "ix_histories_wallet_id_history_at",
+            "wallet_id",
+            "history_at",
+        ),
+        # キャッシュのキーに使うIDを削除後に再利用させない
+        {"sqlite_autoincrement": True},
+    )
     history_id: Mapped[int] = mapped_column(
         primary_key=True
     )
@@ -37,9 +73,10 @@ class HistoryORM(BaseORM):
         ForeignKey(
             "wallets.wallet_id", ondelete="CASCADE"
         ),
-        index=True,
     )
-    history_at: Mapped[datetime]
+    history_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True)
+    )
     wallet: Mapped["WalletORM"] = relationship(
         back_populates="histories"
     )
@@ -58,19 +95,33 @@ class HistoryORM(BaseORM):
     def to_entity(self) -> History:
         return History.model_validate(self)
 
-    def update(self, history: History) -> None:
-        self.name = history.name
-        self.amount = history.amount
-        self.type = history.type
-        self.wallet_id = history.wallet_id
-        self.history_at = history.history_at
+    @hybrid_property
+    def signed_amount(self) -> int:
+        return self.type.signed(self.amount)
+
+    @signed_amount.inplace.expression
+    @classmethod
+    def _signed_amount_expression(cls):
+        return case(
+            (cls.type == HistoryType.INCOME, cls.amount),
+            else_=-cls.amount,
+        )
 
 class WalletORM(BaseORM):
     __tablename__ = "wallets"
+    # キャッシュのキーに使うIDを削除後に再利用させない
+    __table_args__ = {"sqlite_autoincrement": True}
     wallet_id: Mapped[int] = mapped_column(
         primary_key=True
     )
     name: Mapped[str]
+    balance: Mapped[int] = mapped_column(
+        default=0, server_default="0"
+    )
+    # Walletと収支項目のいずれかが書き換わるたびに増やす
+    version: Mapped[int] = mapped_column(
+        default=1, server_default="1"
+    )
     histories: Mapped[
         list[HistoryORM]
     ] = relationship(
@@ -80,6 +131,8 @@ class WalletORM(BaseORM):
             "save-update, merge, expunge"
             ", delete, delete-orphan"
         ),
+        # 子の削除はDBの ON DELETE CASCADE に任せ、ロードしない
+        passive_deletes=True,
     )
 
     @classmethod
@@ -87,21 +140,97 @@ class WalletORM(BaseORM):
         return cls(
             wallet_id=wallet.wallet_id,
             name=wallet.name,
+            balance=wallet.balance,
             histories=wallet.histories,
         )
 
-    def to_entity(self) -> Wallet:
-        return Wallet.model_validate(self)
+    def to_entity(
+        self, with_histories: bool = False
+    ) -> Wallet:
+        # 未ロードのhistoriesに触れると遅延ロードが走るため明示的に組み立てる
+        return Wallet(
+            wallet_id=self.wallet_id,
+            name=self.name,
+            balance=self.balance,
+            histories=[
+                h.to_entity() for h in self.histories
+            ] if with_histories else [],
+        )
 
-    def update(self, wallet: Wallet, histories: list[HistoryORM]) -> None:
-        self.name = wallet.name
-        self.histories = histories
+class RollupORM(BaseORM):
+    """日・月ごとの収支の集計（収支項目の書き込み時に差分で更新する）"""
+    __tablename__ = "rollups"
+    wallet_id: Mapped[int] = mapped_column(
+        ForeignKey(
+            "wallets.wallet_id", ondelete="CASCADE"
+        ),
+        primary_key=True,
+    )
+    granularity: Mapped[Granularity] = mapped_column(
+        Enum(Granularity), primary_key=True
+    )
+    bucket: Mapped[date] = mapped_column(primary_key=True)
+    type: Mapped[HistoryType] = mapped_column(
+        Enum(HistoryType), primary_key=True
+    )
+    amount: Mapped[int]
+    count: Mapped[int]
+
+class BalanceSnapshotORM(BaseORM):
+    """各月初時点（その時刻を含まない）の残高
+
+    残高の過去時点照会で、直近のスナップショットからの差分だけを集計するために使う
+    """
+    __tablename__ = "balance_snapshots"
+    wallet_id: Mapped[int] = mapped_column(
+        ForeignKey(
+            "wallets.wallet_id", ondelete="CASCADE"
+        ),
+        primary_key=True,
+    )
+    snapshot_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True
+    )
+    balance: Mapped[int]
+
+def _buckets(history_at: datetime) -> dict[Granularity, date]:
+    day = as_utc(history_at).date()
+    return {
+        Granularity.DAY: day,
+        Granularity.MONTH: day.replace(day=1),
+    }
+
+def bucket_column(dialect: str, granularity: Granularity):
+    """history_at をUTCの日・月初の日付に切り捨てるSQL式"""
+    if dialect == "postgresql":
+        return cast(
+            func.date_trunc(
+                granularity.value, HistoryORM.history_at
+            ),
+            Date,
+        )
+    if granularity == Granularity.MONTH:
+        return func.date(
+            HistoryORM.history_at, "start of month", type_=Date
+        )
+    return func.date(HistoryORM.history_at, type_=Date)
+
+_HISTORY_COLUMNS = (
+    HistoryORM.history_id,
+    HistoryORM.name,
+    HistoryORM.amount,
+    HistoryORM.type,
+    HistoryORM.history_at,
+    HistoryORM.wallet_id,
+)
 
 class WalletRepository:
     async def add(
         self, session: AsyncSession, name: str
     ) -> Wallet:
-        wallet = WalletORM(name=name, histories=[])
+        wallet = WalletORM(
+            name=name, balance=0, version=1, histories=[]
+        )
         session.add(wallet)
         await session.flush()
         return wallet.to_entity()
@@ -110,32 +239,183 @@ class WalletRepository:
         self,
         session: AsyncSession,
         wallet_id: int,
+        with_histories: bool = False,
     ) -> Wallet | None:
-        stmt = (
-            select(WalletORM)
-            .where(WalletORM.wallet_id == wallet_id)
-            .options(
-                selectinload(WalletORM.histories)
-            )
+        stmt = select(WalletORM).where(
+            WalletORM.wallet_id == wallet_id
         )
         wallet = await session.scalar(stmt)
         if not wallet:
             return None
-        return wallet.to_entity()
+        entity = wallet.to_entity()
+        if with_histories:
+            # ORMオブジェクトを作らず、行から直接エンティティにする
+            entity.histories = [
+                History.model_validate(row)
+                for row in await session.execute(
+                    select(*_HISTORY_COLUMNS)
+                    .where(HistoryORM.wallet_id == wallet_id)
+                    .order_by(HistoryORM.history_at.desc())
+                )
+            ]
+        return entity
+
+    async def get_version(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+    ) -> int | None:
+        stmt = select(WalletORM.version).where(
+            WalletORM.wallet_id == wallet_id
+        )
+        return await session.scalar(stmt)
+
+    async def exists(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+    ) -> bool:
+        stmt = select(WalletORM.wallet_id).where(
+            WalletORM.wallet_id == wallet_id
+        )
+        return await session.scalar(stmt) is not None
 
     async def get_all(
-        self, session: AsyncSession
+        self,
+        session: AsyncSession,
+        limit: int | None = None,
+        after: int | None = None,
+    ) -> list[WalletSummary]:
+        # ORMオブジェクトを経由せず一覧表示に必要な列だけを取得する
+        stmt = select(
+            WalletORM.wallet_id,
+            WalletORM.name,
+            WalletORM.balance,
+        ).order_by(WalletORM.wallet_id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(WalletORM.wallet_id > after)
+        return [
+            WalletSummary.model_validate(row)
+            for row in await session.execute(stmt)
+        ]
+
+    async def get_many(
+        self,
+        session: AsyncSession,
+        wallet_ids: list[int],
+        with_histories: bool = False,
+        history_limit: int | None = None,
     ) -> list[Wallet]:
-        stmt = select(WalletORM).options(
-            selectinload(WalletORM.histories)
-        )
+        """指定したWalletをまとめて取得する（存在しないIDは含まない）
+
+        収支項目は各Walletにつき新しい順に history_limit 件まで
+        """
+        wallets = {
+            row.wallet_id: Wallet.model_validate(row)
+            for row in await session.execute(
+                select(
+                    WalletORM.wallet_id,
+                    WalletORM.name,
+                    WalletORM.balance,
+                ).where(WalletORM.wallet_id.in_(wallet_ids))
+            )
+        }
+        if with_histories and wallets:
+            order_by = (
+                HistoryORM.history_at.desc(),
+                HistoryORM.history_id.desc(),
+            )
+            ranked = (
+                select(
+                    *_HISTORY_COLUMNS,
+                    func.row_number().over(
+                        partition_by=HistoryORM.wallet_id,
+                        order_by=order_by,
+                    ).label("rank"),
+                )
+                .where(HistoryORM.wallet_id.in_(wallets))
+                .subquery()
+            )
+            stmt = select(
+                *(ranked.c[c.key] for c in _HISTORY_COLUMNS)
+            ).order_by(
+                ranked.c.history_at.desc(),
+                ranked.c.history_id.desc(),
+            )
+            if history_limit is not None:
+                stmt = stmt.where(
+                    ranked.c.rank <= history_limit
+                )
+            for row in await session.execute(stmt):
+                wallets[row.wallet_id].histories.append(
+                    History.model_validate(row)
+                )
         return [
-            wallet.to_entity()
-            for wallet in await session.scalars(
-                stmt
+            wallets[wallet_id]
+            for wallet_id in wallet_ids
+            if wallet_id in wallets
+        ]
+
+    async def get_histories(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        limit: int | None = None,
+        after: tuple[datetime, int] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> list[History]:
+        # histories リレーションと同じ history_at の降順で並べ、
+        # 同時刻は history_id の降順でキーを一意にする
+        stmt = (
+            select(HistoryORM)
+            .where(HistoryORM.wallet_id == wallet_id)
+            .order_by(
+                HistoryORM.history_at.desc(),
+                HistoryORM.history_id.desc(),
+            )
+            .limit(limit)
+        )
+        if since is not None:
+            stmt = stmt.where(HistoryORM.history_at >= since)
+        if until is not None:
+            stmt = stmt.where(HistoryORM.history_at < until)
+        if after is not None:
+            stmt = stmt.where(
+                tuple_(
+                    HistoryORM.history_at,
+                    HistoryORM.history_id,
+                )
+                < tuple_(*after)
             )
+        return [
+            history.to_entity()
+            for history in await session.scalars(stmt)
         ]
 
+    async def stream_histories(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        partition_size: int = 1000,
+    ) -> AsyncIterator[list[History]]:
+        # サーバーサイドカーソルで少しずつ取り出し、メモリ使用量を一定に保つ
+        stmt = (
+            select(*_HISTORY_COLUMNS)
+            .where(HistoryORM.wallet_id == wallet_id)
+            .order_by(
+                HistoryORM.history_at.desc(),
+                HistoryORM.history_id.desc(),
+            )
+        )
+        result = await session.stream(stmt)
+        async for rows in result.partitions(
+            partition_size
+        ):
+            yield [
+                History.model_validate(row) for row in rows
+            ]
+
     async def add_history(
         self,
         session: AsyncSession,
@@ -144,48 +424,104 @@ class WalletRepository:
         amount: int,
         type_: HistoryType,
         history_at: datetime,
-    ) -> History:
-        stmt = (
-            select(WalletORM)
-            .where(WalletORM.wallet_id == wallet_id)
-            .options(
-                selectinload(WalletORM.histories)
-            )
-        )
-        wallet = await session.scalar(stmt)
-        if not wallet:
-            raise AppException()
-
+    ) -> History | None:
         history = HistoryORM(
             name=name,
             amount=amount,
             type=type_,
             history_at=history_at,
-            wallet_id=wallet.wallet_id,
+            wallet_id=wallet_id,
         )
-        wallet.histories.append(history)
+        # 残高の更新で対象Walletの存在確認を兼ねる
+        if not await self._record(
+            session, wallet_id, added=[history]
+        ):
+            return None
+        session.add(history)
         await session.flush()
+        await self._checkpoint(session, wallet_id, [history_at])
         return history.to_entity()
 
-    async def update(self, session: AsyncSession, wallet: Wallet) -> Wallet:
+    async def add_histories(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        histories: list[NewHistory],
+    ) -> list[int]:
+        # ORMのバルクINSERTはexecutemanyで分割送信され、
+        # RETURNINGの結果は入力順に揃えられる
+        result = await session.scalars(
+            insert(HistoryORM).returning(
+                HistoryORM.history_id,
+                sort_by_parameter_order=True,
+            ),
+            [
+                {
+                    "name": h.name,
+                    "amount": h.amount,
+                    "type": h.type,
+                    "history_at": h.history_at,
+                    "wallet_id": wallet_id,
+                }
+                for h in histories
+            ],
+        )
+        history_ids = list(result)
+        await self._record(
+            session, wallet_id, added=histories
+        )
+        await self._checkpoint(
+            session,
+            wallet_id,
+            [h.history_at for h in histories],
+        )
+        return history_ids
+
+    async def update(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        name: str,
+    ) -> Wallet | None:
         stmt = (
-            select(WalletORM)
-            .where(WalletORM.wallet_id == wallet.wallet_id)
-            .options(selectinload(WalletORM.histories))
+            update(WalletORM)
+            .where(WalletORM.wallet_id == wallet_id)
+            .values(
+                name=name, version=WalletORM.version + 1
+            )
+            .returning(
+                WalletORM.wallet_id,
+                WalletORM.name,
+                WalletORM.balance,
+            )
         )
-        wallet_ = await session.scalar(stmt)
-        if not wallet_:
-            raise AppException()
+        row = (await session.execute(stmt)).one_or_none()
+        if not row:
+            return None
+        return Wallet.model_validate(row)
 
-        wallet_.update(wallet, wallet_.histories)
-        await session.flush()
-        return wallet_.to_entity()
+    async def delete(
+        self, session: AsyncSession, wallet_id: int
+    ) -> bool:
+        # 1文で削除し、histories は外部キーの ON DELETE CASCADE で消える
+        result = await session.execute(
+            delete(WalletORM).where(
+                WalletORM.wallet_id == wallet_id
+            )
+        )
+        return result.rowcount > 0
 
-    async def delete(self, session: AsyncSession, wallet: Wallet) -> None:
-        stmt = select(WalletORM).where(WalletORM.wallet_id == wallet.wallet_id)
-        wallet_ = await session.scalar(stmt)
-        if wallet_:
-            await session.delete(wallet_)
+    async def history_exists(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+    ) -> bool:
+        stmt = select(HistoryORM.history_id).where(
+            HistoryORM.wallet_id == wallet_id,
+            HistoryORM.history_id == history_id,
+        )
+        return await session.scalar(stmt) is not None
 
     async def get_history_by_id(
         self,
@@ -193,12 +529,9 @@ class WalletRepository:
         wallet_id: int,
         history_id: int,
     ) -> History | None:
-        stmt = (
-            select(HistoryORM)
-            .where(
-                HistoryORM.wallet_id == wallet_id, HistoryORM.history_id == history_id
-            )
-            .options(joinedload(HistoryORM.wallet))
+        stmt = select(HistoryORM).where(
+            HistoryORM.wallet_id == wallet_id,
+            HistoryORM.history_id == history_id,
         )
         history_ = await session.scalar(stmt)
         if not history_:
@@ -207,27 +540,480 @@ class WalletRepository:
         return history_.to_entity()
 
     async def update_history(
-        self, session: AsyncSession, wallet_id: int, history: History
-    ) -> History:
-        stmt = select(HistoryORM).where(
-            HistoryORM.wallet_id == wallet_id,
-            HistoryORM.history_id == history.history_id,
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+        name: str,
+        amount: int,
+        type_: HistoryType,
+        history_at: datetime,
+    ) -> History | None:
+        old = (
+            await session.execute(
+                select(*_HISTORY_COLUMNS).where(
+                    HistoryORM.wallet_id == wallet_id,
+                    HistoryORM.history_id == history_id,
+                )
             )
-        history_ = await session.scalar(stmt)
-        if not history_:
-            raise AppException()
+        ).one_or_none()
+        if not old:
+            return None
 
-        history_.update(history)
-        await session.flush()
-        return history_.to_entity()
+        stmt = (
+            update(HistoryORM)
+            .where(HistoryORM.history_id == history_id)
+            .values(
+                name=name,
+                amount=amount,
+                type=type_,
+                history_at=history_at,
+            )
+            .returning(*_HISTORY_COLUMNS)
+        )
+        history = History.model_validate(
+            (await session.execute(stmt)).one()
+        )
+        await self._record(
+            session,
+            wallet_id,
+            added=[history],
+            removed=[History.model_validate(old)],
+        )
+        await self._checkpoint(
+            session,
+            wallet_id,
+            [old.history_at, history.history_at],
+        )
+        return history
+
+    async def move_history(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+        destination_id: int,
+    ) -> History | None:
+        stmt = (
+            update(HistoryORM)
+            .where(
+                HistoryORM.wallet_id == wallet_id,
+                HistoryORM.history_id == history_id,
+            )
+            .values(wallet_id=destination_id)
+            .returning(*_HISTORY_COLUMNS)
+        )
+        row = (await session.execute(stmt)).one_or_none()
+        if not row:
+            return None
+
+        history = History.model_validate(row)
+        await self._record(
+            session, wallet_id, removed=[history]
+        )
+        await self._record(
+            session, destination_id, added=[history]
+        )
+        for id_ in (wallet_id, destination_id):
+            await self._checkpoint(
+                session, id_, [history.history_at]
+            )
+        return history
+
+    async def move_histories(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        destination_id: int,
+        history_ids: list[int] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> int:
+        """条件に合う収支項目を1つのUPDATEで移動し、移動した件数を返す
+
+        条件を指定しなければWalletの全ての収支項目を移動する
+        """
+        # 合計の集計から移動までの間に他の書き込みが挟まらないよう
+        # 移動元のWalletの行をロックする（SQLiteでは出力されない）
+        await session.execute(
+            select(WalletORM.wallet_id)
+            .where(WalletORM.wallet_id == wallet_id)
+            .with_for_update()
+        )
+        conditions = [HistoryORM.wallet_id == wallet_id]
+        if history_ids is not None:
+            conditions.append(
+                HistoryORM.history_id.in_(history_ids)
+            )
+        if since is not None:
+            conditions.append(HistoryORM.history_at >= since)
+        if until is not None:
+            conditions.append(HistoryORM.history_at < until)
+
+        # 移動する行は返さず、残高と集計の差分は日付・種別ごとの合計から求める
+        day = func.date(HistoryORM.history_at, type_=Date)
+        totals = (await session.execute(
+            select(
+                day,
+                HistoryORM.type,
+                func.sum(HistoryORM.amount),
+                func.count(),
+            )
+            .where(*conditions)
+            .group_by(day, HistoryORM.type)
+        )).all()
+        if not totals:
+            return 0
+        result = await session.execute(
+            update(HistoryORM)
+            .where(*conditions)
+            .values(wallet_id=destination_id)
+        )
+        changes = [
+            (
+                datetime.combine(day_, time(), tzinfo=timezone.utc),
+                type_,
+                amount,
+                count,
+            )
+            for day_, type_, amount, count in totals
+        ]
+        await self._apply(
+            session,
+            wallet_id,
+            [(at, t, -a, -c) for at, t, a, c in changes],
+        )
+        await self._apply(session, destination_id, changes)
+        for id_ in (wallet_id, destination_id):
+            await self._checkpoint(
+                session, id_, [at for at, *_ in changes]
+            )
+        return result.rowcount
 
     async def delete_history(
-        self, session: AsyncSession, wallet_id: int, history: History
-    ):
-        stmt = select(HistoryORM).where(
-            HistoryORM.wallet_id == wallet_id,
-            HistoryORM.history_id == history.history_id,
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_id: int,
+    ) -> bool:
+        stmt = (
+            delete(HistoryORM)
+            .where(
+                HistoryORM.wallet_id == wallet_id,
+                HistoryORM.history_id == history_id,
             )
-        history_ = await session.scalar(stmt)
-        if history_:
-            await session.delete(history_)
+            .returning(*_HISTORY_COLUMNS)
+        )
+        row = (await session.execute(stmt)).one_or_none()
+        if not row:
+            return False
+        history = History.model_validate(row)
+        await self._record(
+            session, wallet_id, removed=[history]
+        )
+        await self._checkpoint(
+            session, wallet_id, [history.history_at]
+        )
+        return True
+
+    async def get_summary(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        granularity: Granularity,
+        since: date | None = None,
+        until: date | None = None,
+    ) -> list[Summary]:
+        def total(type_: HistoryType):
+            return func.coalesce(
+                func.sum(
+                    case(
+                        (RollupORM.type == type_, RollupORM.amount),
+                        else_=0,
+                    )
+                ),
+                0,
+            )
+
+        stmt = (
+            select(
+                RollupORM.bucket,
+                total(HistoryType.INCOME).label("income"),
+                total(HistoryType.OUTCOME).label("outcome"),
+            )
+            .where(
+                RollupORM.wallet_id == wallet_id,
+                RollupORM.granularity == granularity,
+            )
+            .group_by(RollupORM.bucket)
+            .having(func.sum(RollupORM.count) > 0)
+            .order_by(RollupORM.bucket)
+        )
+        if since is not None:
+            stmt = stmt.where(RollupORM.bucket >= since)
+        if until is not None:
+            stmt = stmt.where(RollupORM.bucket < until)
+        return [
+            Summary.model_validate(row)
+            for row in await session.execute(stmt)
+        ]
+
+    async def get_balance_at(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        at: datetime,
+    ) -> int | None:
+        """指定時刻（その時刻を含む）時点の残高
+
+        前後で最も近いスナップショットから、間の収支項目だけを集計する
+        """
+        def total(*conditions):
+            return session.scalar(
+                select(
+                    func.coalesce(
+                        func.sum(HistoryORM.signed_amount), 0
+                    )
+                ).where(
+                    HistoryORM.wallet_id == wallet_id,
+                    *conditions,
+                )
+            )
+
+        previous = await session.scalar(
+            select(BalanceSnapshotORM)
+            .where(
+                BalanceSnapshotORM.wallet_id == wallet_id,
+                BalanceSnapshotORM.snapshot_at <= at,
+            )
+            .order_by(BalanceSnapshotORM.snapshot_at.desc())
+            .limit(1)
+        )
+        if previous:
+            return previous.balance + await total(
+                HistoryORM.history_at
+                >= previous.snapshot_at,
+                HistoryORM.history_at <= at,
+            )
+
+        following = await session.scalar(
+            select(BalanceSnapshotORM)
+            .where(
+                BalanceSnapshotORM.wallet_id == wallet_id,
+                BalanceSnapshotORM.snapshot_at > at,
+            )
+            .order_by(BalanceSnapshotORM.snapshot_at)
+            .limit(1)
+        )
+        if following:
+            return following.balance - await total(
+                HistoryORM.history_at > at,
+                HistoryORM.history_at
+                < following.snapshot_at,
+            )
+
+        # スナップショットがまだ無ければ現在の残高から遡る
+        balance = await session.scalar(
+            select(WalletORM.balance).where(
+                WalletORM.wallet_id == wallet_id
+            )
+        )
+        if balance is None:
+            return None
+        return balance - await total(
+            HistoryORM.history_at > at
+        )
+
+    async def _checkpoint(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        history_ats: Iterable[datetime] = (),
+    ) -> None:
+        """今月初と、書き込んだ収支項目の各月初のスナップショットが無ければ作成する
+
+        残高と収支項目が一致している書き込み後に呼び出す
+        過去の日付の収支項目を追加しても、残高の照会はその月の中だけを集計すれば済む
+        """
+        months = {month_start(utcnow())} | {
+            month_start(history_at) for history_at in history_ats
+        }
+        existing = await session.scalars(
+            select(BalanceSnapshotORM.snapshot_at).where(
+                BalanceSnapshotORM.wallet_id == wallet_id,
+                BalanceSnapshotORM.snapshot_at.in_(months),
+            )
+        )
+        missing = sorted(months - {as_utc(s) for s in existing})
+        if not missing:
+            return
+
+        balance = await session.scalar(
+            select(WalletORM.balance).where(
+                WalletORM.wallet_id == wallet_id
+            )
+        )
+        if balance is None:
+            return
+        conn = await session.connection()
+        month = bucket_column(conn.dialect.name, Granularity.MONTH)
+        totals = dict((await session.execute(
+            select(month, func.sum(HistoryORM.signed_amount))
+            .where(
+                HistoryORM.wallet_id == wallet_id,
+                HistoryORM.history_at >= missing[0],
+            )
+            .group_by(month)
+        )).all())
+        insert_ = (
+            postgresql.insert
+            if conn.dialect.name == "postgresql"
+            else sqlite.insert
+        )
+        rows = []
+        for snapshot_at in missing:
+            # 月初時点の残高 = 現在の残高 - その月初以降の収支
+            later = sum(
+                amount for bucket, amount in totals.items()
+                if bucket >= snapshot_at.date()
+            )
+            rows.append({
+                "wallet_id": wallet_id,
+                "snapshot_at": snapshot_at,
+                "balance": balance - later,
+            })
+        # 並行する書き込みが同じ月のスナップショットを先に作成していてもよい
+        await session.execute(
+            insert_(BalanceSnapshotORM)
+            .values(rows)
+            .on_conflict_do_nothing()
+        )
+
+    async def _record(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        added: Iterable[NewHistory | HistoryORM] = (),
+        removed: Iterable[NewHistory | HistoryORM] = (),
+    ) -> bool:
+        """収支項目の追加・削除をWalletの残高と集計に反映する
+
+        Walletが存在しない場合は何もせずFalseを返す
+        """
+        return await self._apply(
+            session,
+            wallet_id,
+            [
+                (h.history_at, h.type, sign * h.amount, sign)
+                for histories, sign in ((added, 1), (removed, -1))
+                for h in histories
+            ],
+        )
+
+    async def _apply(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        changes: Iterable[tuple[datetime, HistoryType, int, int]],
+    ) -> bool:
+        """(日時, 種別, 金額の増減, 件数の増減) を残高と集計に反映する"""
+        amounts: Counter = Counter()
+        counts: Counter = Counter()
+        snapshots: Counter = Counter()
+        balance = 0
+        for history_at, type_, amount, count in changes:
+            signed_amount = type_.signed(amount)
+            balance += signed_amount
+            # history_at より後の月初のスナップショットだけが影響を受ける
+            snapshots[next_month_start(history_at)] += signed_amount
+            for granularity, bucket in _buckets(history_at).items():
+                key = (granularity, bucket, type_)
+                amounts[key] += amount
+                counts[key] += count
+
+        if not await self._add_balance(
+            session, wallet_id, balance
+        ):
+            return False
+        await self._add_rollups(
+            session, wallet_id, amounts, counts
+        )
+        for snapshot_at, delta in snapshots.items():
+            if delta:
+                await session.execute(
+                    update(BalanceSnapshotORM)
+                    .where(
+                        BalanceSnapshotORM.wallet_id
+                        == wallet_id,
+                        BalanceSnapshotORM.snapshot_at
+                        >= snapshot_at,
+                    )
+                    .values(
+                        balance=BalanceSnapshotORM.balance
+                        + delta
+                    )
+                )
+        return True
+
+    async def _add_rollups(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        amounts: Counter,
+        counts: Counter,
+    ) -> None:
+        conn = await session.connection()
+        insert_ = (
+            postgresql.insert
+            if conn.dialect.name == "postgresql"
+            else sqlite.insert
+        )
+        rows = []
+        for key, amount in amounts.items():
+            # 同じ日付内での更新など差し引き0になる行は送らない
+            if not amount and not counts[key]:
+                continue
+            granularity, bucket, type_ = key
+            rows.append({
+                "wallet_id": wallet_id,
+                "granularity": granularity,
+                "bucket": bucket,
+                "type": type_,
+                "amount": amount,
+                "count": counts[key],
+            })
+        # バインド変数の上限を超えないよう分割して送る
+        for i in range(0, len(rows), 1000):
+            stmt = insert_(RollupORM).values(rows[i:i + 1000])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[
+                    RollupORM.wallet_id,
+                    RollupORM.granularity,
+                    RollupORM.bucket,
+                    RollupORM.type,
+                ],
+                set_={
+                    "amount": RollupORM.amount
+                    + stmt.excluded.amount,
+                    "count": RollupORM.count
+                    + stmt.excluded.count,
+                },
+            )
+            await session.execute(stmt)
+
+    async def _add_balance(
+        self,
+        session: AsyncSession,
+        wallet_id: int,
+        delta: int,
+    ) -> bool:
+        # 読み出してから書き戻すと同時更新で差分が失われるためSQL側で加算する
+        result = await session.execute(
+            update(WalletORM)
+            .where(WalletORM.wallet_id == wallet_id)
+            .values(
+                balance=WalletORM.balance + delta,
+                version=WalletORM.version + 1,
+            )
+        )
+        return result.rowcount > 0
@@ -0,0 +1,79 @@
+import types
+import typing
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+class FastJSONResponse(JSONResponse):
+    """orjsonで出力するレスポンス
+
+    タイムゾーンなしの日時はUTCとみなし、UTCは末尾Zで出力する
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z,
+        )
+
+def _nested_schema(annotation: Any) -> tuple[type | None, bool]:
+    """フィールドの型から (入れ子のスキーマ, リストかどうか) を返す"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is list and args:
+        schema, _ = _nested_schema(args[0])
+        return schema, True
+    if origin in (typing.Union, types.UnionType):
+        for arg in args:
+            schema, many = _nested_schema(arg)
+            if schema is not None:
+                return schema, many
+    return None, False
+
+@lru_cache
+def _plan(
+    schema: type[BaseModel],
+) -> tuple[tuple[str, type | None, bool], ...]:
+    return tuple(
+        (name, *_nested_schema(field.annotation))
+        for name, field in schema.model_fields.items()
+    )
+
+def dump(schema: type[BaseModel], obj: Any) -> dict:
+    """スキーマのフィールドだけをobjの属性から取り出す
+
+    検証もシリアライザの呼び出しもしないため、
+    値は既に検証済み（ORMの行やエンティティ）である必要がある
+    """
+    get = (
+        obj.__getitem__ if isinstance(obj, Mapping)
+        else obj.__getattribute__
+    )
+    result = {}
+    for name, nested, many in _plan(schema):
+        value = get(name)
+        if nested is not None and value is not None:
+            value = (
+                [dump(nested, v) for v in value] if many
+                else dump(nested, value)
+            )
+        result[name] = value
+    return result
+
+def render(
+    schema: type[BaseModel],
+    obj: Any,
+    status_code: int = 200,
+    headers: Mapping[str, str] | None = None,
+) -> FastJSONResponse:
+    """response_modelの再検証を経ずにレスポンスを返す"""
+    return FastJSONResponse(
+        dump(schema, obj),
+        status_code=status_code,
+        headers=headers,
+    )
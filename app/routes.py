@@ -1,37 +1,81 @@
-import json
 import logging
+import random
+import re
 from fastapi.routing import APIRoute
+from app.metrics import IN_FLIGHT
+from app.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+def _compile_redaction(
+    fields: list[str],
+) -> re.Pattern | None:
+    if not fields:
+        return None
+    names = b"|".join(re.escape(f.encode()) for f in fields)
+    # JSONとしては解析せず、"field": 値 の値部分だけを置き換える
+    return re.compile(
+        rb'("(?:' + names + rb')"\s*:\s*)'
+        rb'(?:"(?:[^"\\]|\\.)*"?|[^,}\]\s]+)'
+    )
+
+def _dump(
+    body: bytes,
+    max_bytes: int,
+    redaction: re.Pattern | None = None,
+) -> str:
+    dumped = body[:max_bytes]
+    if redaction is not None:
+        dumped = redaction.sub(rb'\1"***"', dumped)
+    text = dumped.decode(errors="replace")
+    if len(body) > max_bytes:
+        text += f"...({len(body)} bytes)"
+    return text
+
 class LoggingRoute(APIRoute):
     def get_route_handler(self):
         original = super().get_route_handler()
+        settings = get_settings()
+        sample_rate = settings.log_sample_rate
+        max_bytes = settings.log_body_max_bytes
+        redaction = _compile_redaction([
+            f.strip()
+            for f in settings.log_redact_fields.split(",")
+            if f.strip()
+        ])
+
+        async def logged_route_handler(request):
+            if (
+                not logger.isEnabledFor(logging.INFO)
+                or random.random() >= sample_rate
+            ):
+                return await original(request)
 
-        async def custom_route_handler(request):
             url = str(request.url)
             method = request.method
-            try:
-                req = json.loads(
-                    (await request.body()).decode()
-                )
-            except:
-                req = ""
-            logger.info("dump req: %s %s: %s",
-                        method, url, req)
+            logger.info(
+                "dump req: %s %s: %s", method, url,
+                _dump(await request.body(),
+                      max_bytes, redaction))
 
             # パスオペレーションの実行
             response = await original(request)
 
-            status_code = response.status_code
-            try:
-                res = json.loads(
-                    response.body.decode()
-                )
-            except:
-                res = ""
-            logger.info("dump res: %s %s %s: %s",
-                        status_code, method, url, res)
+            # StreamingResponseは本文を持たないので記録しない
+            logger.info(
+                "dump res: %s %s %s: %s",
+                response.status_code, method, url,
+                _dump(getattr(response, "body", b""),
+                      max_bytes, redaction))
             return response
 
+        async def custom_route_handler(request):
+            # ルートが決まった後で数え、ルートのパスごとに集計する
+            labels = (request.method, self.path)
+            IN_FLIGHT.inc(*labels)
+            try:
+                return await logged_route_handler(request)
+            finally:
+                IN_FLIGHT.dec(*labels)
+
         return custom_route_handler
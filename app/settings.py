@@ -0,0 +1,60 @@
+import os
+from functools import lru_cache
+from pydantic import BaseModel
+
+class Settings(BaseModel):
+    database_url: str = "sqlite+aiosqlite:///database.db"
+    # 以下はPostgreSQLなどサーバー型のDB利用時のみ有効
+    # ワーカー数 x (pool_size + max_overflow) が接続上限を超えないようにする
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_timeout: float = 30.0
+    database_pool_pre_ping: bool = True
+    # GETのユースケースが使うレプリカ。未指定ならdatabase_urlから読む
+    database_read_url: str | None = None
+    # 書き込み後この秒数は同じAPIキーのGETもプライマリから読む（0で無効）
+    read_your_writes_seconds: float = 0.0
+    # Walletと収支項目のキャッシュ（"local" または "none"）
+    cache_backend: str = "local"
+    cache_ttl: float = 60.0  # 秒
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 67108864
+    # 管理APIのキー（未指定なら管理APIは使えない）
+    admin_api_key: str | None = None
+    # 検証済みAPIキーのキャッシュ。失効は他のプロセスにこの秒数以内で反映される
+    api_key_cache_ttl: float = 60.0
+    # APIキーごとのレート制限（"local" または "none"）
+    rate_limit_backend: str = "local"
+    rate_limit_read_per_second: float = 20.0
+    rate_limit_read_burst: int = 100
+    rate_limit_write_per_second: float = 5.0
+    rate_limit_write_burst: int = 50
+    # 検証前のキーの読み書き。認証で検証されると個別の制限に移る
+    rate_limit_unverified_per_second: float = 1.0
+    rate_limit_unverified_burst: int = 5
+    rate_limit_concurrency: int = 10  # 同時実行数の上限（0で無効）
+    # リクエスト・レスポンス本文のログ
+    log_level: str = "INFO"
+    log_sample_rate: float = 1.0  # 記録するリクエストの割合（0〜1）
+    log_body_max_bytes: int = 1024
+    log_redact_fields: str = "password,token,api_key"  # カンマ区切り
+    # 同じリクエストで同じSQLがこの回数を超えて実行されたら警告する（0で無効）
+    debug_duplicate_queries: int = 0
+    # 以下はSQLite利用時のみ有効
+    sqlite_busy_timeout: int = 5000  # ミリ秒
+    sqlite_cache_size: int = -65536  # 負の値はKiB単位
+    sqlite_mmap_size: int = 268435456  # バイト
+    sqlite_read_pool_size: int = 4
+
+    @classmethod
+    def from_env(cls, prefix: str = "APP_") -> "Settings":
+        # 例: APP_DATABASE_URL -> database_url
+        return cls.model_validate({
+            name: os.environ[prefix + name.upper()]
+            for name in cls.model_fields
+            if prefix + name.upper() in os.environ
+        })
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings.from_env()
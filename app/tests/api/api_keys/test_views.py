@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import ANY
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import Settings
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(
+        "app.api.get_settings", lambda: Settings(admin_api_key="ADMIN-KEY")
+    )
+    return {"APP-ADMIN-KEY": "ADMIN-KEY"}
+
+
+@pytest.mark.anyio
+async def test_api_keys(ac, session: AsyncSession, admin):
+    response = await ac.post(
+        "/api/v1/admin/api-keys", json={"name": "aggregator"}, headers=admin
+    )
+    assert response.status_code == 201
+    created = response.json()
+    assert created == {
+        "api_key_id": ANY,
+        "name": "aggregator",
+        "created_at": ANY,
+        "revoked_at": None,
+        "key": ANY,
+    }
+    headers = {"APP-API-KEY": created["key"]}
+
+    response = await ac.get("/api/v1/wallets", headers=headers)
+    assert response.status_code == 200
+
+    response = await ac.get("/api/v1/admin/api-keys", headers=admin)
+    assert [k["name"] for k in response.json()["api_keys"]] == ["test", "aggregator"]
+
+    response = await ac.delete(
+        f"/api/v1/admin/api-keys/{created['api_key_id']}", headers=admin
+    )
+    assert response.status_code == 204
+    response = await ac.get("/api/v1/wallets", headers=headers)
+    assert response.status_code == 403
+
+    response = await ac.delete(
+        f"/api/v1/admin/api-keys/{created['api_key_id']}", headers=admin
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_api_keys_forbidden(ac, session: AsyncSession):
+    response = await ac.get("/api/v1/wallets", headers={"APP-API-KEY": "WRONG"})
+    assert response.status_code == 403
+
+    # 管理APIのキーが未設定なら管理APIは使えない
+    response = await ac.get(
+        "/api/v1/admin/api-keys", headers={"APP-ADMIN-KEY": "ADMIN-KEY"}
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.anyio
+async def test_revocation_is_bounded_by_cache_ttl(session: AsyncSession):
+    from app.cache import LocalCache
+    from app.repositories import ApiKeyRepository
+    from app.repositories.api_key import ApiKeyORM
+
+    repo = ApiKeyRepository(LocalCache(ttl=0.1, max_entries=10, max_bytes=1024))
+    assert await repo.verify(session, "DUMMY-KEY")
+    assert not await repo.verify(session, "WRONG")
+
+    # 他のプロセスで失効した場合
+    await session.execute(update(ApiKeyORM).values(revoked_at=ApiKeyORM.created_at))
+    assert await repo.verify(session, "DUMMY-KEY")
+    await asyncio.sleep(0.1)
+    assert not await repo.verify(session, "DUMMY-KEY")
@@ -0,0 +1,119 @@
+from unittest.mock import ANY
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def history(wallet_id, name, amount, type_="INCOME"):
+    return {
+        "op": "createHistory",
+        "wallet_id": wallet_id,
+        "name": name,
+        "amount": amount,
+        "type": type_,
+        "history_at": "2023-02-01T00:00:00Z",
+    }
+
+
+@pytest.mark.anyio
+async def test_post_batch(ac, session: AsyncSession):
+    bar = (await ac.post("/api/v1/wallets", json={"name": "bar"})).json()
+
+    response = await ac.post(
+        "/api/v1/batch",
+        json={
+            "operations": [
+                {"op": "createWallet", "name": "foo"},
+                history("$0.wallet_id", "ham", 1000),
+                history("$0.wallet_id", "egg", 300, "OUTCOME"),
+                {
+                    "op": "moveHistory",
+                    "wallet_id": "$0.wallet_id",
+                    "history_id": "$2.history_id",
+                    "destination_id": bar["wallet_id"],
+                },
+                {"op": "updateWallet", "wallet_id": bar["wallet_id"], "name": "baz"},
+                {
+                    "op": "deleteHistory",
+                    "wallet_id": "$0.wallet_id",
+                    "history_id": "$1.history_id",
+                },
+            ]
+        },
+    )
+    assert response.status_code == 200
+    wallet = {"wallet_id": ANY, "name": "foo", "balance": 0}
+    ham = {
+        "history_id": ANY,
+        "name": "ham",
+        "amount": 1000,
+        "type": "INCOME",
+        "history_at": "2023-02-01T00:00:00Z",
+    }
+    egg = {**ham, "name": "egg", "amount": 300, "type": "OUTCOME"}
+    assert response.json() == {
+        "results": [
+            {"op": "createWallet", "wallet": wallet, "history": None},
+            {"op": "createHistory", "wallet": None, "history": ham},
+            {"op": "createHistory", "wallet": None, "history": egg},
+            {"op": "moveHistory", "wallet": None, "history": egg},
+            {
+                "op": "updateWallet",
+                "wallet": {"wallet_id": bar["wallet_id"], "name": "baz", "balance": -300},
+                "history": None,
+            },
+            {"op": "deleteHistory", "wallet": None, "history": None},
+        ]
+    }
+
+    wallet_id = response.json()["results"][0]["wallet"]["wallet_id"]
+    response = await ac.get(
+        f"/api/v1/wallets/{wallet_id}", params={"include_histories": True}
+    )
+    assert response.json() == {**wallet, "histories": []}
+
+
+@pytest.mark.anyio
+async def test_post_batch_rolls_back(ac, session: AsyncSession):
+    response = await ac.post(
+        "/api/v1/batch",
+        json={
+            "operations": [
+                {"op": "createWallet", "name": "foo"},
+                history("$0.wallet_id", "ham", 1000),
+                history(0, "egg", 300),
+            ]
+        },
+    )
+    assert response.status_code == 404
+    assert response.json() == {
+        "message": "Not Found",
+        "details": {"operation": 2, "wallet": 0},
+    }
+
+    response = await ac.get("/api/v1/wallets")
+    assert response.json()["wallets"] == []
+
+
+@pytest.mark.anyio
+async def test_post_batch_invalid_reference(ac, session: AsyncSession):
+    response = await ac.post(
+        "/api/v1/batch",
+        json={
+            "operations": [
+                {"op": "createWallet", "name": "foo"},
+                history("$1.wallet_id", "ham", 1000),
+            ]
+        },
+    )
+    assert response.status_code == 400
+    assert response.json()["details"] == {
+        "operation": 1,
+        "reference": "$1.wallet_id",
+    }
+
+    response = await ac.post(
+        "/api/v1/batch",
+        json={"operations": [history("wallet", "ham", 1000)]},
+    )
+    assert response.status_code == 422
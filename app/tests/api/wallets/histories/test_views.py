@@ -1,3 +1,6 @@
+import csv
+import io
+import json
 from datetime import datetime, timezone
 from unittest.mock import ANY
 
@@ -16,6 +19,7 @@ async def setup_data(session: AsyncSession):
     )
     wallet2 = WalletORM(
         name="bar",
+        balance=700,
         histories=[
             HistoryORM(
                 name="ham",
@@ -62,9 +66,139 @@ async def test_get_histories(ac, session: AsyncSession):
                 "type": "INCOME",
             },
         ],
+        "next_cursor": None,
     }
 
 
+@pytest.mark.anyio
+async def test_get_histories_not_modified(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+    url = f"/api/v1/wallets/{wallet.wallet_id}/histories"
+
+    response = await ac.get(url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await ac.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await ac.put(
+        f"/api/v1/wallets/{wallet.wallet_id}", json={"name": "baz"}
+    )
+    assert response.status_code == 200
+
+    response = await ac.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_get_histories_paginated(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+
+    response = await ac.get(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories", params={"limit": 1}
+    )
+    assert response.status_code == 200
+    assert [h["name"] for h in response.json()["histories"]] == ["egg"]
+    assert response.json()["next_cursor"]
+
+    response = await ac.get(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories",
+        params={"limit": 1, "cursor": response.json()["next_cursor"]},
+    )
+    assert response.status_code == 200
+    assert [h["name"] for h in response.json()["histories"]] == ["ham"]
+    assert response.json()["next_cursor"] is None
+
+
+@pytest.mark.anyio
+async def test_get_histories_date_range(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+
+    response = await ac.get(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories",
+        params={"from": "2023-02-01T00:30:00Z", "to": "2023-02-01T01:00:00Z"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"histories": [], "next_cursor": None}
+
+    response = await ac.get(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories",
+        params={"from": "2023-02-01T09:30:00+09:00"},
+    )
+    assert response.status_code == 200
+    assert [h["name"] for h in response.json()["histories"]] == ["egg"]
+
+
+@pytest.mark.anyio
+async def test_get_histories_wallet_not_found(ac, session: AsyncSession):
+    response = await ac.get("/api/v1/wallets/0/histories")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_export_histories_ndjson(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+
+    response = await ac.get(f"/api/v1/wallets/{wallet.wallet_id}/histories:export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {
+            "history_id": ANY,
+            "name": "egg",
+            "amount": 300,
+            "history_at": "2023-02-01T01:00:00Z",
+            "type": "OUTCOME",
+        },
+        {
+            "history_id": ANY,
+            "name": "ham",
+            "amount": 1000,
+            "history_at": "2023-02-01T00:00:00Z",
+            "type": "INCOME",
+        },
+    ]
+
+
+@pytest.mark.anyio
+async def test_export_histories_csv(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+
+    response = await ac.get(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories:export",
+        params={"format": "csv"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(r["name"], r["amount"], r["history_at"]) for r in rows] == [
+        ("egg", "300", "2023-02-01T01:00:00Z"),
+        ("ham", "1000", "2023-02-01T00:00:00Z"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_export_histories_wallet_not_found(ac, session: AsyncSession):
+    response = await ac.get("/api/v1/wallets/0/histories:export")
+    assert response.status_code == 404
+
+
 @pytest.mark.anyio
 async def test_get_history(ac, session: AsyncSession):
     from app.repositories.wallet import HistoryORM
@@ -88,6 +222,17 @@ async def test_get_history(ac, session: AsyncSession):
         "type": "OUTCOME",
     }
 
+    base = f"/api/v1/wallets/{history.wallet.wallet_id}/histories"
+    etag = response.headers["ETag"]
+    response = await ac.get(
+        f"{base}/{history.history_id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    # 同じWalletのETagでも存在しない収支項目は404
+    response = await ac.get(f"{base}/0", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+    assert response.json()["details"] == {"history": 0}
+
 
 @pytest.mark.anyio
 async def test_post_history(ac, session: AsyncSession):
@@ -120,6 +265,117 @@ async def test_post_history(ac, session: AsyncSession):
     }
     await session.refresh(wallet)
     assert len(wallet.histories) == 3
+    assert wallet.balance == 300
+
+
+@pytest.mark.anyio
+async def test_post_history_with_offset(ac, session: AsyncSession):
+    wallet = (await ac.post("/api/v1/wallets", json={"name": "foo"})).json()
+    base = f"/api/v1/wallets/{wallet['wallet_id']}"
+
+    response = await ac.post(
+        f"{base}/histories",
+        json={
+            "name": "spam",
+            "amount": 400,
+            "history_at": "2026-03-01T05:00:00+09:00",
+            "type": "INCOME",
+        },
+    )
+    assert response.json()["history_at"] == "2026-02-28T20:00:00Z"
+
+    # 保存・集計・絞り込みのいずれもUTCで扱う
+    response = await ac.get(
+        f"{base}/histories",
+        params={"since": "2026-02-28T19:00:00Z", "until": "2026-02-28T21:00:00Z"},
+    )
+    assert [h["history_at"] for h in response.json()["histories"]] == [
+        "2026-02-28T20:00:00Z"
+    ]
+    response = await ac.get(f"{base}/summary", params={"granularity": "day"})
+    assert response.json()["summaries"] == [
+        {"bucket": "2026-02-28", "income": 400, "outcome": 0, "net": 400}
+    ]
+    response = await ac.get(f"{base}/balance", params={"at": "2026-02-28T20:00:00Z"})
+    assert response.json()["balance"] == 400
+    response = await ac.get(f"{base}/balance", params={"at": "2026-02-28T19:59:59Z"})
+    assert response.json()["balance"] == 0
+
+
+@pytest.mark.anyio
+async def test_post_history_wallet_not_found(ac, session: AsyncSession):
+    response = await ac.post(
+        "/api/v1/wallets/0/histories",
+        json={
+            "name": "spam",
+            "amount": 400,
+            "history_at": "2023-02-01T02:00:00Z",
+            "type": "OUTCOME",
+        },
+    )
+    assert response.status_code == 404
+    assert response.json()["details"] == {"wallet": 0}
+
+
+@pytest.mark.anyio
+async def test_post_histories(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(
+        select(WalletORM)
+        .where(WalletORM.name == "bar")
+        .options(selectinload(WalletORM.histories))
+    )
+    assert len(wallet.histories) == 2
+
+    response = await ac.post(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories:bulk",
+        json={
+            "histories": [
+                {
+                    "name": f"spam{i}",
+                    "amount": 100,
+                    "history_at": "2023-02-02T00:00:00Z",
+                    "type": "INCOME" if i % 2 else "OUTCOME",
+                }
+                for i in range(5)
+            ]
+        },
+    )
+    assert response.status_code == 201
+    history_ids = response.json()["history_ids"]
+    assert len(history_ids) == 5
+
+    await session.refresh(wallet)
+    assert len(wallet.histories) == 7
+    assert wallet.balance == 600
+    names = {h.history_id: h.name for h in wallet.histories}
+    assert [names[i] for i in history_ids] == [f"spam{i}" for i in range(5)]
+
+
+@pytest.mark.anyio
+async def test_post_histories_invalid_item(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+
+    response = await ac.post(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories:bulk",
+        json={
+            "histories": [
+                {
+                    "name": "spam",
+                    "amount": amount,
+                    "history_at": "2023-02-02T00:00:00Z",
+                    "type": "INCOME",
+                }
+                for amount in (100, 0)
+            ]
+        },
+    )
+    assert response.status_code == 422
 
 
 @pytest.mark.anyio
@@ -153,6 +409,8 @@ async def test_put_history(ac, session: AsyncSession):
     await session.refresh(history)
     assert history.name == "spam"
     assert history.amount == 600
+    await session.refresh(history.wallet)
+    assert history.wallet.balance == 400
 
 
 @pytest.mark.anyio
@@ -174,6 +432,7 @@ async def test_delete_history(ac, session: AsyncSession):
 
     await session.refresh(wallet)
     assert len(wallet.histories) == 1
+    assert wallet.balance == 1000
 
 
 @pytest.mark.anyio
@@ -213,3 +472,113 @@ async def test_move_history(ac, session: AsyncSession):
     await session.refresh(bar_wallet)
     assert len(foo_wallet.histories) == 1
     assert len(bar_wallet.histories) == 1
+    assert foo_wallet.balance == -300
+    assert bar_wallet.balance == 1000
+
+
+@pytest.mark.anyio
+async def test_move_history_destination_not_found(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(
+        select(WalletORM)
+        .where(WalletORM.name == "bar")
+        .options(selectinload(WalletORM.histories))
+    )
+
+    response = await ac.post(
+        f"/api/v1/wallets/{wallet.wallet_id}/histories/{wallet.histories[0].history_id}/move",
+        json={"destination_id": 0},
+    )
+    assert response.status_code == 404
+    assert response.json()["details"] == {"wallet": 0}
+    await session.refresh(wallet)
+    assert len(wallet.histories) == 2
+    assert wallet.balance == 700
+
+
+@pytest.mark.anyio
+async def test_move_histories(ac, session: AsyncSession):
+    foo = (await ac.post("/api/v1/wallets", json={"name": "foo"})).json()
+    bar = (await ac.post("/api/v1/wallets", json={"name": "bar"})).json()
+    base = f"/api/v1/wallets/{foo['wallet_id']}"
+    response = await ac.post(
+        f"{base}/histories:bulk",
+        json={
+            "histories": [
+                {
+                    "name": f"h{i}",
+                    "amount": 100 * (i + 1),
+                    "type": "INCOME" if i % 2 else "OUTCOME",
+                    "history_at": f"2023-0{i + 1}-15T00:00:00Z",
+                }
+                for i in range(4)
+            ]
+        },
+    )
+    ids = response.json()["history_ids"]
+
+    async def wallet(wallet_id):
+        return (await ac.get(f"/api/v1/wallets/{wallet_id}")).json()["balance"]
+
+    async def summary(wallet_id):
+        response = await ac.get(f"/api/v1/wallets/{wallet_id}/summary")
+        return [s["bucket"] for s in response.json()["summaries"]]
+
+    # -100 + 200 - 300 + 400
+    assert await wallet(foo["wallet_id"]) == 200
+
+    response = await ac.post(
+        f"{base}/histories:move",
+        json={"destination_id": bar["wallet_id"], "history_ids": [ids[0], ids[1], 0]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"moved": 2}
+    assert await wallet(foo["wallet_id"]) == 100
+    assert await wallet(bar["wallet_id"]) == 100
+    assert await summary(bar["wallet_id"]) == ["2023-01-01", "2023-02-01"]
+
+    response = await ac.post(
+        f"{base}/histories:move",
+        json={
+            "destination_id": bar["wallet_id"],
+            "from": "2023-03-01T00:00:00Z",
+            "to": "2023-04-01T00:00:00Z",
+        },
+    )
+    assert response.json() == {"moved": 1}
+    assert await summary(foo["wallet_id"]) == ["2023-04-01"]
+    response = await ac.get(
+        f"/api/v1/wallets/{bar['wallet_id']}/balance",
+        params={"at": "2023-03-31T00:00:00Z"},
+    )
+    assert response.json()["balance"] == -200
+
+    response = await ac.post(
+        f"{base}/histories:move", json={"destination_id": bar["wallet_id"]}
+    )
+    assert response.json() == {"moved": 1}
+    assert await wallet(foo["wallet_id"]) == 0
+    assert await wallet(bar["wallet_id"]) == 200
+    assert await summary(foo["wallet_id"]) == []
+
+
+@pytest.mark.anyio
+async def test_move_histories_invalid(ac, session: AsyncSession):
+    foo = (await ac.post("/api/v1/wallets", json={"name": "foo"})).json()
+    base = f"/api/v1/wallets/{foo['wallet_id']}/histories:move"
+
+    response = await ac.post(base, json={"destination_id": 0})
+    assert response.status_code == 404
+    assert response.json()["details"] == {"wallet": 0}
+
+    response = await ac.post(
+        base,
+        json={
+            "destination_id": foo["wallet_id"],
+            "history_ids": [1],
+            "from": "2023-03-01T00:00:00Z",
+        },
+    )
+    assert response.status_code == 422
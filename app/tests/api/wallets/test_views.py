@@ -15,6 +15,7 @@ async def setup_data(session: AsyncSession):
     )
     wallet2 = WalletORM(
         name="bar",
+        balance=700,
         histories=[
             HistoryORM(
                 name="ham",
@@ -39,7 +40,7 @@ async def setup_data(session: AsyncSession):
 async def test_get_wallets(ac, session: AsyncSession):
     response = await ac.get("/api/v1/wallets")
     assert response.status_code == 200
-    assert response.json() == {"wallets": []}
+    assert response.json() == {"wallets": [], "next_cursor": None}
 
 
 @pytest.mark.anyio
@@ -52,10 +53,39 @@ async def test_get_wallets_with_data(ac, session: AsyncSession):
         "wallets": [
             {"balance": 0, "name": "foo", "wallet_id": ANY},
             {"balance": 700, "name": "bar", "wallet_id": ANY},
-        ]
+        ],
+        "next_cursor": None,
     }
 
 
+@pytest.mark.anyio
+async def test_get_wallets_paginated(ac, session: AsyncSession):
+    await setup_data(session)
+
+    response = await ac.get("/api/v1/wallets", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.json() == {
+        "wallets": [{"balance": 0, "name": "foo", "wallet_id": ANY}],
+        "next_cursor": ANY,
+    }
+
+    response = await ac.get(
+        "/api/v1/wallets",
+        params={"limit": 1, "cursor": response.json()["next_cursor"]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "wallets": [{"balance": 700, "name": "bar", "wallet_id": ANY}],
+        "next_cursor": None,
+    }
+
+
+@pytest.mark.anyio
+async def test_get_wallets_invalid_cursor(ac, session: AsyncSession):
+    response = await ac.get("/api/v1/wallets", params={"cursor": "invalid"})
+    assert response.status_code == 400
+
+
 @pytest.mark.anyio
 async def test_get_wallet(ac, session: AsyncSession):
     from app.repositories.wallet import WalletORM
@@ -102,6 +132,66 @@ async def test_get_wallet_include_histories(ac, session: AsyncSession):
     }
 
 
+@pytest.mark.anyio
+async def test_get_wallet_not_modified(ac, session: AsyncSession):
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+    url = f"/api/v1/wallets/{wallet.wallet_id}"
+
+    response = await ac.get(url, params={"include_histories": True})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await ac.get(
+        url, params={"include_histories": True}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = await ac.post(
+        f"{url}/histories",
+        json={
+            "name": "spam",
+            "amount": 400,
+            "history_at": "2023-02-01T02:00:00Z",
+            "type": "OUTCOME",
+        },
+    )
+    assert response.status_code == 201
+
+    response = await ac.get(
+        url, params={"include_histories": True}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["balance"] == 300
+
+
+@pytest.mark.anyio
+async def test_get_wallet_cached(ac, session: AsyncSession):
+    from app.database import cache
+    from app.repositories.wallet import WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "foo"))
+    url = f"/api/v1/wallets/{wallet.wallet_id}"
+
+    response = await ac.get(url)
+    assert response.status_code == 200
+    hits = cache.stats.hits
+    response = await ac.get(url)
+    assert response.status_code == 200
+    assert cache.stats.hits > hits
+
+    response = await ac.put(url, json={"name": "baz"})
+    assert response.status_code == 200
+    response = await ac.get(url)
+    assert response.json() == {"balance": 0, "name": "baz", "wallet_id": ANY}
+
+
 @pytest.mark.anyio
 async def test_post_wallet(ac, session: AsyncSession):
     from app.repositories.wallet import WalletRepository
@@ -148,6 +238,12 @@ async def test_put_wallet(ac, session: AsyncSession):
     assert wallet.name == "baz"
 
 
+@pytest.mark.anyio
+async def test_put_wallet_not_found(ac, session: AsyncSession):
+    response = await ac.put("/api/v1/wallets/0", json={"name": "baz"})
+    assert response.status_code == 404
+
+
 @pytest.mark.anyio
 async def test_delete_wallet(ac, session: AsyncSession):
     from app.repositories.wallet import WalletORM, WalletRepository
@@ -161,3 +257,310 @@ async def test_delete_wallet(ac, session: AsyncSession):
 
     assert response.status_code == 204
     assert len(await WalletRepository().get_all(session)) == 1
+
+
+@pytest.mark.anyio
+async def test_delete_wallet_cascades_histories(ac, session: AsyncSession):
+    from app.repositories.wallet import HistoryORM, WalletORM
+
+    await setup_data(session)
+    wallet = await session.scalar(select(WalletORM).where(WalletORM.name == "bar"))
+    response = await ac.delete(
+        f"/api/v1/wallets/{wallet.wallet_id}",
+    )
+
+    assert response.status_code == 204
+    assert (await session.scalars(select(HistoryORM))).all() == []
+
+
+@pytest.mark.anyio
+async def test_recreate_wallet_after_delete(ac, session: AsyncSession):
+    old = (await ac.post("/api/v1/wallets", json={"name": "old"})).json()
+    history = {
+        "name": "spam",
+        "amount": 100,
+        "type": "INCOME",
+        "history_at": "2023-02-01T00:00:00Z",
+    }
+    await ac.post(f"/api/v1/wallets/{old['wallet_id']}/histories", json=history)
+    # キャッシュに載せてから削除する
+    await ac.get(f"/api/v1/wallets/{old['wallet_id']}")
+    await ac.get(f"/api/v1/wallets/{old['wallet_id']}/histories")
+    await ac.delete(f"/api/v1/wallets/{old['wallet_id']}")
+
+    new = (await ac.post("/api/v1/wallets", json={"name": "new"})).json()
+    assert new["wallet_id"] != old["wallet_id"]
+    response = await ac.get(f"/api/v1/wallets/{new['wallet_id']}")
+    assert response.json()["name"] == "new"
+    response = await ac.get(f"/api/v1/wallets/{new['wallet_id']}/histories")
+    assert response.json()["histories"] == []
+    response = await ac.get(f"/api/v1/wallets/{old['wallet_id']}")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_get_summary(ac, session: AsyncSession):
+    foo = (await ac.post("/api/v1/wallets", json={"name": "foo"})).json()
+    bar = (await ac.post("/api/v1/wallets", json={"name": "bar"})).json()
+
+    def history(name, amount, type_, history_at):
+        return {
+            "name": name,
+            "amount": amount,
+            "type": type_,
+            "history_at": history_at,
+        }
+
+    response = await ac.post(
+        f"/api/v1/wallets/{foo['wallet_id']}/histories:bulk",
+        json={
+            "histories": [
+                history("a", 1000, "INCOME", "2023-01-31T23:00:00Z"),
+                history("b", 300, "OUTCOME", "2023-02-01T00:00:00Z"),
+                history("c", 200, "OUTCOME", "2023-02-01T12:00:00Z"),
+            ]
+        },
+    )
+    a_id, b_id, c_id = response.json()["history_ids"]
+    base = f"/api/v1/wallets/{foo['wallet_id']}/histories"
+    await ac.put(
+        f"{base}/{a_id}", json=history("a", 1500, "INCOME", "2023-02-02T00:00:00Z")
+    )
+    await ac.post(f"{base}/{b_id}/move", json={"destination_id": bar["wallet_id"]})
+    await ac.delete(f"{base}/{c_id}")
+    await ac.post(base, json=history("d", 100, "OUTCOME", "2023-03-01T00:00:00Z"))
+
+    response = await ac.get(
+        f"/api/v1/wallets/{foo['wallet_id']}/summary", params={"granularity": "day"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "granularity": "day",
+        "summaries": [
+            {"bucket": "2023-02-02", "income": 1500, "outcome": 0, "net": 1500},
+            {"bucket": "2023-03-01", "income": 0, "outcome": 100, "net": -100},
+        ],
+    }
+
+    response = await ac.get(
+        f"/api/v1/wallets/{foo['wallet_id']}/summary",
+        params={"granularity": "month", "from": "2023-01-01", "to": "2023-03-01"},
+    )
+    assert response.json() == {
+        "granularity": "month",
+        "summaries": [
+            {"bucket": "2023-02-01", "income": 1500, "outcome": 0, "net": 1500},
+        ],
+    }
+
+    response = await ac.get(f"/api/v1/wallets/{bar['wallet_id']}/summary")
+    assert response.json() == {
+        "granularity": "month",
+        "summaries": [
+            {"bucket": "2023-02-01", "income": 0, "outcome": 300, "net": -300},
+        ],
+    }
+
+
+@pytest.mark.anyio
+async def test_get_summary_not_found(ac, session: AsyncSession):
+    response = await ac.get("/api/v1/wallets/0/summary")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_get_balance(ac, session: AsyncSession):
+    from app.repositories.wallet import BalanceSnapshotORM
+    from app.utils.datetime import month_start, utcnow
+
+    foo = (await ac.post("/api/v1/wallets", json={"name": "foo"})).json()
+    bar = (await ac.post("/api/v1/wallets", json={"name": "bar"})).json()
+    base = f"/api/v1/wallets/{foo['wallet_id']}"
+
+    def history(name, amount, type_, history_at):
+        return {
+            "name": name,
+            "amount": amount,
+            "type": type_,
+            "history_at": history_at,
+        }
+
+    response = await ac.post(
+        f"{base}/histories:bulk",
+        json={
+            "histories": [
+                history("a", 1000, "INCOME", "2023-01-31T23:00:00Z"),
+                history("b", 300, "OUTCOME", "2023-02-01T00:00:00Z"),
+                history("c", 5000, "INCOME", "2099-01-15T00:00:00Z"),
+            ]
+        },
+    )
+    a_id, b_id, _ = response.json()["history_ids"]
+
+    async def balance(at):
+        response = await ac.get(f"{base}/balance", params={"at": at})
+        assert response.status_code == 200
+        return response.json()["balance"]
+
+    # 今月初のスナップショットより前は後ろから、後は前から集計する
+    assert await balance("2023-01-31T22:59:59Z") == 0
+    assert await balance("2023-01-31T23:00:00Z") == 1000
+    assert await balance("2023-02-01T00:00:00Z") == 700
+    assert await balance("2099-01-14T00:00:00Z") == 700
+    # オフセット付きの時刻はUTCに直して照会し、そのまま返す
+    assert await balance("2023-02-01T08:59:59+09:00") == 1000
+    response = await ac.get(f"{base}/balance", params={"at": "2023-02-01T09:00:00+09:00"})
+    assert response.json() == {
+        "wallet_id": foo["wallet_id"],
+        "at": "2023-02-01T00:00:00Z",
+        "balance": 700,
+    }
+    assert await balance("2099-01-15T00:00:00Z") == 5700
+
+    # 過去の収支項目の変更はスナップショットに反映される
+    await ac.put(
+        f"{base}/histories/{a_id}",
+        json=history("a", 1500, "INCOME", "2023-03-01T00:00:00Z"),
+    )
+    await ac.post(
+        f"{base}/histories/{b_id}/move",
+        json={"destination_id": bar["wallet_id"]},
+    )
+    await ac.post(
+        f"{base}/histories", json=history("d", 100, "OUTCOME", "2023-02-15T00:00:00Z")
+    )
+    assert await balance("2023-02-01T00:00:00Z") == 0
+    assert await balance("2023-03-01T00:00:00Z") == 1400
+    assert await balance("2099-01-15T00:00:00Z") == 6400
+
+    # 書き込んだ収支項目の各月初と今月初にスナップショットがある
+    snapshots = (
+        await session.scalars(
+            select(BalanceSnapshotORM)
+            .where(BalanceSnapshotORM.wallet_id == foo["wallet_id"])
+            .order_by(BalanceSnapshotORM.snapshot_at)
+        )
+    ).all()
+    this_month = month_start(utcnow()).replace(tzinfo=None)
+    assert {
+        s.snapshot_at.replace(tzinfo=None): s.balance for s in snapshots
+    } == {
+        datetime(2023, 1, 1): 0,
+        datetime(2023, 2, 1): 0,
+        datetime(2023, 3, 1): -100,
+        this_month: 1400,
+        datetime(2099, 1, 1): 1400,
+    }
+
+    response = await ac.get(
+        f"/api/v1/wallets/{bar['wallet_id']}/balance",
+        params={"at": "2023-02-01T00:00:00Z"},
+    )
+    assert response.json() == {
+        "wallet_id": bar["wallet_id"],
+        "at": "2023-02-01T00:00:00Z",
+        "balance": -300,
+    }
+
+
+@pytest.mark.anyio
+async def test_get_balance_backdated_import(ac, session: AsyncSession):
+    from app.repositories.wallet import BalanceSnapshotORM
+
+    foo = (await ac.post("/api/v1/wallets", json={"name": "foo"})).json()
+    base = f"/api/v1/wallets/{foo['wallet_id']}"
+    histories = [
+        {
+            "name": f"h{i}",
+            "amount": 10,
+            "type": "INCOME",
+            "history_at": f"2022-{i % 12 + 1:02}-{i % 28 + 1:02}T00:00:00Z",
+        }
+        for i in range(150)
+    ]
+    response = await ac.post(f"{base}/histories:bulk", json={"histories": histories})
+    assert response.status_code == 201
+
+    # 過去の各月にスナップショットが作成される
+    snapshots = (
+        await session.scalars(
+            select(BalanceSnapshotORM.snapshot_at).where(
+                BalanceSnapshotORM.wallet_id == foo["wallet_id"]
+            )
+        )
+    ).all()
+    assert len(snapshots) == 13
+    response = await ac.get(f"{base}/balance", params={"at": "2022-06-30T23:59:59Z"})
+    expected = 10 * sum(1 for i in range(150) if i % 12 < 6)
+    assert response.json()["balance"] == expected
+
+
+@pytest.mark.anyio
+async def test_get_balance_without_snapshot(ac, session: AsyncSession):
+    await setup_data(session)
+    bar = (await ac.get("/api/v1/wallets")).json()["wallets"][1]
+
+    response = await ac.get(
+        f"/api/v1/wallets/{bar['wallet_id']}/balance",
+        params={"at": "2023-02-01T00:30:00Z"},
+    )
+    assert response.status_code == 200
+    assert response.json()["balance"] == 1000
+
+
+@pytest.mark.anyio
+async def test_get_balance_not_found(ac, session: AsyncSession):
+    response = await ac.get(
+        "/api/v1/wallets/0/balance", params={"at": "2023-02-01T00:00:00Z"}
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_batch_get_wallets(ac, session: AsyncSession):
+    await setup_data(session)
+    foo, bar = (await ac.get("/api/v1/wallets")).json()["wallets"]
+
+    response = await ac.post(
+        "/api/v1/wallets:batchGet",
+        json={"wallet_ids": [bar["wallet_id"], 0, foo["wallet_id"], 0]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"wallets": [bar, foo], "missing_ids": [0]}
+
+    response = await ac.post(
+        "/api/v1/wallets:batchGet",
+        json={
+            "wallet_ids": [foo["wallet_id"], bar["wallet_id"]],
+            "include_histories": True,
+            "history_limit": 1,
+        },
+    )
+    assert response.json() == {
+        "wallets": [
+            {**foo, "histories": []},
+            {
+                **bar,
+                "histories": [
+                    {
+                        "amount": 300,
+                        "history_at": "2023-02-01T01:00:00Z",
+                        "history_id": ANY,
+                        "name": "egg",
+                        "type": "OUTCOME",
+                    },
+                ],
+            },
+        ],
+        "missing_ids": [],
+    }
+
+
+@pytest.mark.anyio
+async def test_batch_get_wallets_invalid(ac, session: AsyncSession):
+    response = await ac.post("/api/v1/wallets:batchGet", json={"wallet_ids": []})
+    assert response.status_code == 422
+    response = await ac.post(
+        "/api/v1/wallets:batchGet", json={"wallet_ids": [1], "history_limit": 0}
+    )
+    assert response.status_code == 422
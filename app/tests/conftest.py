@@ -1,12 +1,16 @@
+import os
 from collections.abc import AsyncGenerator, Generator
 import pytest
 from httpx import AsyncClient
 from app.main import app
-from app.database import get_session
+from app import database, middlewares
+from app.database import create_engine, get_read_session, get_session
 from app.repositories import BaseORM
+from app.repositories.api_key import ApiKeyORM, hash_api_key
+from app.settings import Settings
 from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import Session, SessionTransaction
 
 @pytest.fixture
@@ -26,7 +30,17 @@ async def ac():
 
 @pytest.fixture
 async def session() -> AsyncGenerator:
-    async_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    # テストごとにDBを作り直すためIDが再利用される
+    if database.cache is not None:
+        await database.cache.clear()
+    await database.api_key_cache.clear()
+    if middlewares.rate_limiter is not None:
+        await middlewares.rate_limiter.clear()
+    # TEST_DATABASE_URL=postgresql+asyncpg://... でPostgreSQLに対してテストできる
+    database_url = os.environ.get(
+        "TEST_DATABASE_URL", "sqlite+aiosqlite:///:memory:"
+    )
+    async_engine = create_engine(Settings(database_url=database_url))
     async with async_engine.connect() as conn:
         await conn.run_sync(lambda sync_conn: BaseORM.metadata.create_all(sync_conn.engine))
 
@@ -56,7 +70,14 @@ async def session() -> AsyncGenerator:
                 pass
 
         app.dependency_overrides[get_session] = test_get_session
+        app.dependency_overrides[get_read_session] = test_get_session
+
+        async_session.add(
+            ApiKeyORM(name="test", key_hash=hash_api_key("DUMMY-KEY"))
+        )
+        await async_session.commit()
 
         yield async_session
         await async_session.close()
         await conn.rollback()
+    await async_engine.dispose()
@@ -0,0 +1,78 @@
+import pytest
+
+from app.cache import LocalCache
+
+
+@pytest.mark.anyio
+async def test_local_cache_lru():
+    cache = LocalCache(ttl=60, max_entries=2, max_bytes=1024)
+    await cache.set("a", b"1")
+    await cache.set("b", b"2")
+    assert await cache.get("a") == b"1"
+    await cache.set("c", b"3")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"1"
+    assert await cache.get("c") == b"3"
+    assert cache.stats.hits == 3
+    assert cache.stats.misses == 1
+    assert cache.stats.evictions == 1
+    assert cache.stats.entries == 2
+
+
+@pytest.mark.anyio
+async def test_local_cache_max_bytes():
+    cache = LocalCache(ttl=60, max_entries=10, max_bytes=4)
+    await cache.set("a", b"12")
+    await cache.set("b", b"34")
+    await cache.set("c", b"56")
+    await cache.set("d", b"too large")
+
+    assert await cache.get("a") is None
+    assert await cache.get("d") is None
+    assert cache.stats.bytes == 4
+
+
+@pytest.mark.anyio
+async def test_local_cache_ttl():
+    cache = LocalCache(ttl=0, max_entries=10, max_bytes=1024)
+    await cache.set("a", b"1")
+
+    assert await cache.get("a") is None
+    assert cache.stats.entries == 0
+
+
+@pytest.mark.anyio
+async def test_local_cache_delete():
+    cache = LocalCache(ttl=60, max_entries=10, max_bytes=1024)
+    await cache.set("a", b"1")
+    await cache.delete("a", "b")
+
+    assert await cache.get("a") is None
+    assert cache.stats.bytes == 0
+
+
+@pytest.mark.anyio
+async def test_cached_repository_skips_lagging_replica(session):
+    from app.repositories import CachedWalletRepository
+    from app.repositories.cached import REPLICA
+    from app.repositories.wallet import WalletORM
+
+    wallet = WalletORM(name="foo")
+    session.add(wallet)
+    await session.flush()
+    cache = LocalCache(ttl=60, max_entries=10, max_bytes=1024)
+
+    lagging = True
+    repo = CachedWalletRepository(cache, replica_lagging=lambda: lagging)
+    session.info[REPLICA] = True
+    try:
+        # 書き込み直後のレプリカから読んだ値は保存しない
+        assert await repo.get_version(session, wallet.wallet_id) == 1
+        assert cache.stats.entries == 0
+        lagging = False
+        assert await repo.get_version(session, wallet.wallet_id) == 1
+        assert cache.stats.entries == 1
+    finally:
+        del session.info[REPLICA]
+
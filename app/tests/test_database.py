@@ -0,0 +1,142 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import database
+
+
+@pytest.fixture
+def recent_writes(monkeypatch):
+    recent_writes = database.RecentWrites(seconds=60)
+    monkeypatch.setattr(database, "recent_writes", recent_writes)
+    return recent_writes
+
+
+async def first(gen):
+    async for value in gen:
+        return value
+
+
+@pytest.mark.anyio
+async def test_get_read_session_uses_replica(recent_writes):
+    sessionmaker = await first(database.get_read_session(api_key="foo"))
+    assert sessionmaker is database.AsyncReadSessionLocal
+
+
+@pytest.mark.anyio
+async def test_get_read_session_after_write(recent_writes):
+    await first(database.get_session(api_key="foo"))
+
+    sessionmaker = await first(database.get_read_session(api_key="foo"))
+    assert sessionmaker is database.AsyncSessionLocal
+    sessionmaker = await first(database.get_read_session(api_key="bar"))
+    assert sessionmaker is database.AsyncReadSessionLocal
+
+
+def test_recent_writes_any():
+    recent_writes = database.RecentWrites(seconds=60)
+    assert not recent_writes.any()
+    recent_writes.mark("foo")
+    assert recent_writes.any()
+
+
+def test_recent_writes_disabled():
+    recent_writes = database.RecentWrites(seconds=0)
+    recent_writes.mark("foo")
+    assert "foo" not in recent_writes
+
+
+@pytest.mark.anyio
+async def test_upgrade_schema_from_baseline():
+    from sqlalchemy import select, text
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app.models import HistoryType
+    from app.repositories import upgrade_schema
+    from app.repositories.wallet import (
+        BalanceSnapshotORM,
+        RollupORM,
+        WalletORM,
+    )
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for statement in (
+            "CREATE TABLE wallets ("
+            "wallet_id INTEGER PRIMARY KEY, name VARCHAR NOT NULL)",
+            "CREATE TABLE histories ("
+            "history_id INTEGER PRIMARY KEY, name VARCHAR NOT NULL,"
+            " amount INTEGER NOT NULL CHECK (amount > 0),"
+            " type VARCHAR(7) NOT NULL,"
+            " wallet_id INTEGER NOT NULL"
+            " REFERENCES wallets (wallet_id) ON DELETE CASCADE,"
+            " history_at DATETIME NOT NULL)",
+            "CREATE INDEX ix_histories_wallet_id"
+            " ON histories (wallet_id)",
+            "INSERT INTO wallets VALUES (1, 'a'), (2, 'b')",
+            "INSERT INTO histories VALUES"
+            " (1, 'x', 300, 'INCOME', 1, '2026-03-01 05:00:00.000000'),"
+            " (2, 'y', 100, 'OUTCOME', 1, '2026-03-02 05:00:00.000000'),"
+            " (3, 'z', 50, 'INCOME', 1, '2026-05-10 00:00:00.000000')",
+        ):
+            await conn.execute(text(statement))
+
+        await conn.run_sync(upgrade_schema)
+
+        wallets = (await conn.execute(
+            select(
+                WalletORM.wallet_id,
+                WalletORM.balance,
+                WalletORM.version,
+            ).order_by(WalletORM.wallet_id)
+        )).all()
+        assert wallets == [(1, 250, 1), (2, 0, 1)]
+        rollups = (await conn.execute(
+            select(
+                RollupORM.granularity,
+                RollupORM.bucket,
+                RollupORM.type,
+                RollupORM.amount,
+                RollupORM.count,
+            ).order_by(
+                RollupORM.granularity, RollupORM.bucket, RollupORM.type
+            )
+        )).all()
+        assert rollups == [
+            ("day", date(2026, 3, 1), HistoryType.INCOME, 300, 1),
+            ("day", date(2026, 3, 2), HistoryType.OUTCOME, 100, 1),
+            ("day", date(2026, 5, 10), HistoryType.INCOME, 50, 1),
+            ("month", date(2026, 3, 1), HistoryType.INCOME, 300, 1),
+            ("month", date(2026, 3, 1), HistoryType.OUTCOME, 100, 1),
+            ("month", date(2026, 5, 1), HistoryType.INCOME, 50, 1),
+        ]
+        snapshots = (await conn.execute(
+            select(
+                BalanceSnapshotORM.wallet_id,
+                BalanceSnapshotORM.snapshot_at,
+                BalanceSnapshotORM.balance,
+            ).order_by(BalanceSnapshotORM.snapshot_at)
+        )).all()
+        # 収支項目のある各月の月初時点の残高
+        assert snapshots == [
+            (1, datetime(2026, 3, 1), 0),
+            (1, datetime(2026, 5, 1), 200),
+        ]
+        indexes = {
+            row[0] for row in await conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            ))
+        }
+        assert "ix_histories_wallet_id_history_at" in indexes
+        assert "ix_histories_wallet_id" not in indexes
+        # 2回目は何もしない
+        await conn.run_sync(upgrade_schema)
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_recent_writes_keeps_only_hashes(recent_writes):
+    from app.repositories.api_key import hash_api_key
+
+    await first(database.get_session(api_key="foo"))
+    assert "foo" not in recent_writes._until
+    assert hash_api_key("foo") in recent_writes
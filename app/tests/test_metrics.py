@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.metrics import Counter, Histogram
+from app.settings import Settings
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(
+        "app.api.get_settings", lambda: Settings(admin_api_key="ADMIN-KEY")
+    )
+    return {"APP-ADMIN-KEY": "ADMIN-KEY"}
+
+
+def test_counter_only_increases():
+    counter = Counter("events_total", "Events.", ("kind",))
+    counter.inc("a")
+    counter.inc("a", value=2)
+
+    assert not hasattr(counter, "set") and not hasattr(counter, "dec")
+    with pytest.raises(ValueError):
+        counter.inc("a", value=-1)
+    assert list(counter.samples()) == ['events_total{kind="a"} 3']
+
+
+def test_histogram_exposition():
+    histogram = Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe("/a", value=0.05)
+    histogram.observe("/a", value=0.1)
+    histogram.observe("/a", value=3)
+
+    assert list(histogram.expose()) == [
+        "# HELP latency Latency.",
+        "# TYPE latency histogram",
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1"} 2',
+        'latency_bucket{route="/a",le="+Inf"} 3',
+        'latency_sum{route="/a"} 3.15',
+        'latency_count{route="/a"} 3',
+    ]
+
+
+async def scrape(ac, headers) -> dict[str, float]:
+    response = await ac.get("/metrics", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return {
+        sample: float(value)
+        for sample, value in (
+            line.rsplit(" ", 1)
+            for line in response.text.splitlines()
+            if not line.startswith("#")
+        )
+    }
+
+
+@pytest.mark.anyio
+async def test_get_metrics(ac, session: AsyncSession, admin):
+    labels = 'method="GET",route="/api/v1/wallets/{wallet_id}"'
+    requests = f'http_requests_total{{{labels},status="404"}}'
+    duration = f"http_request_duration_seconds_count{{{labels}}}"
+    size = f"http_response_size_bytes_count{{{labels}}}"
+
+    unmatched = 'http_requests_total{method="GET",route="<unmatched>",status="404"}'
+
+    before = await scrape(ac, admin)
+    await ac.get("/api/v1/wallets/1")
+    await ac.get("/api/v1/wallets/2")
+    await ac.get("/api/v1/unknown")
+    after = await scrape(ac, admin)
+
+    for sample in (requests, duration, size):
+        assert after[sample] - before.get(sample, 0) == 2
+    assert after[unmatched] - before.get(unmatched, 0) == 1
+    # 処理を終えたリクエストは処理中の数から除かれる
+    assert after[f"http_requests_in_flight{{{labels}}}"] == 0
+    assert 'cache_requests_total{result="hit"}' in after
+
+
+@pytest.mark.anyio
+async def test_get_metrics_requires_admin_key(ac, admin):
+    response = await ac.get("/metrics")
+    assert response.status_code == 403
+
+    response = await ac.get("/metrics", headers={"APP-ADMIN-KEY": "WRONG"})
+    assert response.status_code == 403
@@ -0,0 +1,49 @@
+import anyio
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.middlewares import AccessLogMiddleware
+
+
+@pytest.mark.anyio
+async def test_access_log_middleware_streams():
+    app = FastAPI()
+    sent = []
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield b"a"
+            # 先に送ったチャンクはバッファされずに届いている
+            assert [m.get("body") for m in sent[1:]] == [b"a"]
+            yield b"bc"
+
+        return StreamingResponse(chunks())
+
+    async def receive():
+        await anyio.sleep_forever()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "server": ("test", 80),
+        "client": ("test", 1234),
+        "app": app,
+    }
+    await AccessLogMiddleware(app)(scope, receive, send)
+
+    assert sent[0]["type"] == "http.response.start"
+    assert [m.get("body") for m in sent[1:]] == [b"a", b"bc", b""]
+    assert any(name == b"server-timing" for name, _ in sent[0]["headers"])
@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import query_stats
+
+
+@pytest.mark.anyio
+async def test_query_stats(session: AsyncSession):
+    stats = query_stats.start()
+    for _ in range(3):
+        await session.execute(text("SELECT 1"))
+    await session.execute(text("SELECT 2"))
+
+    assert stats.statements["SELECT 1"] == 3
+    assert stats.statements["SELECT 2"] == 1
+    assert stats.count == sum(stats.statements.values())
+    assert stats.duration >= stats.slowest > 0
+    assert stats.slowest_statement in stats.statements
+    assert stats.duplicates(2) == {"SELECT 1": 3}
+    assert stats.duplicates(3) == {}
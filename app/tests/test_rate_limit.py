@@ -0,0 +1,162 @@
+import pytest
+from fastapi import FastAPI, Request
+from httpx import AsyncClient
+
+from app.cache import LocalCache
+from app.exceptions import init_exception_handler
+from app.rate_limit import LocalRateLimiter, RateLimitMiddleware, consume
+from app.repositories.api_key import hash_api_key
+from app.settings import Settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.anyio
+async def test_local_rate_limiter_token_bucket():
+    clock = Clock()
+    limiter = LocalRateLimiter(max_keys=2, clock=clock)
+
+    assert await limiter.acquire("a", rate=2, burst=2) == 0
+    assert await limiter.acquire("a", rate=2, burst=2) == 0
+    assert await limiter.acquire("a", rate=2, burst=2) == 0.5
+    clock.now = 0.5
+    assert await limiter.acquire("a", rate=2, burst=2) == 0
+    # 補充はburstで頭打ちになる
+    clock.now = 100
+    for _ in range(2):
+        assert await limiter.acquire("a", rate=2, burst=2) == 0
+    assert await limiter.acquire("a", rate=2, burst=2) > 0
+
+    # 複数個の消費
+    clock.now = 200
+    assert await limiter.acquire("a", rate=2, burst=2, cost=2) == 0
+    assert await limiter.acquire("a", rate=2, burst=2, cost=2) == 1
+
+    # 古いキーから捨て、満杯のバケットに戻る
+    await limiter.acquire("b", rate=2, burst=2)
+    await limiter.acquire("c", rate=2, burst=2)
+    assert list(limiter._buckets) == ["b", "c"]
+
+
+@pytest.mark.anyio
+async def test_local_rate_limiter_concurrency():
+    limiter = LocalRateLimiter()
+    assert await limiter.enter("a", 2)
+    assert await limiter.enter("a", 2)
+    assert not await limiter.enter("a", 2)
+    await limiter.leave("a")
+    assert await limiter.enter("a", 2)
+    await limiter.leave("a")
+    await limiter.leave("a")
+    assert limiter._running == {}
+
+
+@pytest.mark.anyio
+async def test_rate_limit_middleware():
+    app = FastAPI()
+
+    @app.get("/")
+    async def read():
+        return {}
+
+    @app.post("/")
+    async def write():
+        return {}
+
+    clock = Clock()
+    limiter = LocalRateLimiter(clock=clock)
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=limiter,
+        settings=Settings(
+            rate_limit_read_per_second=1,
+            rate_limit_read_burst=2,
+            rate_limit_write_per_second=0.25,
+            rate_limit_write_burst=1,
+        ),
+    )
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = {"APP-API-KEY": "a"}
+        assert (await ac.get("/", headers=headers)).status_code == 200
+        assert (await ac.get("/", headers=headers)).status_code == 200
+        response = await ac.get("/", headers=headers)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+        assert response.json() == {"message": "Too Many Requests"}
+
+        # 書き込みとキーごとに別のバケットで数える
+        assert (await ac.post("/", headers=headers)).status_code == 200
+        response = await ac.post("/", headers=headers)
+        assert response.headers["retry-after"] == "4"
+        assert (await ac.get("/", headers={"APP-API-KEY": "b"})).status_code == 200
+        assert (await ac.get("/")).status_code == 200
+        # キーはハッシュ値で保持する
+        assert f"{hash_api_key('a')}:read" in limiter._buckets
+        assert not any(key.startswith("a:") for key in limiter._buckets)
+
+
+@pytest.mark.anyio
+async def test_rate_limit_middleware_buckets():
+    app = FastAPI()
+    init_exception_handler(app)
+
+    @app.post("/items:batchGet")
+    async def batch_get():
+        return {}
+
+    @app.post("/batch")
+    async def batch(request: Request, cost: int):
+        await consume(request, cost - 1)
+        return {}
+
+    verified = LocalCache(ttl=60, max_entries=10, max_bytes=1000)
+    await verified.set(hash_api_key("a"), b"1")
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=LocalRateLimiter(clock=Clock()),
+        settings=Settings(
+            rate_limit_read_per_second=1,
+            rate_limit_read_burst=2,
+            rate_limit_write_per_second=1,
+            rate_limit_write_burst=4,
+            rate_limit_unverified_per_second=1,
+            rate_limit_unverified_burst=1,
+        ),
+        verified=verified,
+    )
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = {"APP-API-KEY": "a"}
+        # 読み取りだけのPOSTは読み取りのバケットで数える
+        for _ in range(2):
+            response = await ac.post("/items:batchGet", headers=headers)
+            assert response.status_code == 200
+        response = await ac.post("/items:batchGet", headers=headers)
+        assert response.status_code == 429
+
+        # 一括操作は操作数だけ消費する
+        response = await ac.post("/batch", params={"cost": 3}, headers=headers)
+        assert response.status_code == 200
+        response = await ac.post("/batch", params={"cost": 3}, headers=headers)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        assert response.json() == {"message": "Too Many Requests"}
+
+        # 未検証のキーはキーごとに小さなバケットで数え、他のキーには影響しない
+        for key in ("x", "y"):
+            response = await ac.post(
+                "/items:batchGet", headers={"APP-API-KEY": key}
+            )
+            assert response.status_code == 200
+        response = await ac.post("/items:batchGet", headers={"APP-API-KEY": "x"})
+        assert response.status_code == 429
+
+        # 検証されると個別の制限に移る
+        await verified.set(hash_api_key("x"), b"1")
+        response = await ac.post("/items:batchGet", headers={"APP-API-KEY": "x"})
+        assert response.status_code == 200
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+from app.api.wallets.schemas import GetWalletResponseWithHistories
+from app.models import History, HistoryType, Wallet
+from app.responses import render
+
+
+def test_render_skips_unknown_fields_and_writes_utc():
+    wallet = Wallet(
+        wallet_id=1,
+        name="foo",
+        balance=-300,
+        histories=[
+            History(
+                history_id=2,
+                wallet_id=1,
+                name="egg",
+                amount=300,
+                type=HistoryType.OUTCOME,
+                history_at=datetime(2023, 2, 1, 1, 0),
+            ),
+            History.model_construct(
+                history_id=3,
+                wallet_id=1,
+                name="ham",
+                amount=1,
+                type=HistoryType.INCOME,
+                history_at=datetime(2023, 2, 1, 9, 30, tzinfo=timezone.utc),
+            ),
+        ],
+    )
+
+    response = render(
+        GetWalletResponseWithHistories, wallet, headers={"ETag": 'W/"1-1"'}
+    )
+    assert response.headers["etag"] == 'W/"1-1"'
+    assert response.body == (
+        b'{"wallet_id":1,"name":"foo","balance":-300,"histories":['
+        b'{"history_id":2,"name":"egg","amount":300,"type":"OUTCOME",'
+        b'"history_at":"2023-02-01T01:00:00Z"},'
+        b'{"history_id":3,"name":"ham","amount":1,"type":"INCOME",'
+        b'"history_at":"2023-02-01T09:30:00Z"}]}'
+    )
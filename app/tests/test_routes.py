@@ -0,0 +1,45 @@
+import logging
+import re
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.routes import _compile_redaction, _dump
+
+
+def test_dump_truncates_and_redacts():
+    redaction = _compile_redaction(["password", "token"])
+
+    assert _dump(b'{"name": "foo"}', 1024, redaction) == '{"name": "foo"}'
+    assert (
+        _dump(b'{"password": "p\\"w", "token": 123}', 1024, redaction)
+        == '{"password": "***", "token": "***"}'
+    )
+    assert _dump(b'{"password": "secret"}', 16, redaction) == (
+        '{"password": "***"...(22 bytes)'
+    )
+    assert _dump(b"0123456789", 4) == "0123...(10 bytes)"
+
+
+@pytest.mark.anyio
+async def test_logging_route(ac, session: AsyncSession, caplog):
+    with caplog.at_level(logging.INFO, logger="app.routes"):
+        await ac.post("/api/v1/wallets", json={"name": "foo"})
+
+    messages = [r.getMessage() for r in caplog.records if r.name == "app.routes"]
+    assert messages == [
+        'dump req: POST http://test/api/v1/wallets: {"name": "foo"}',
+        'dump res: 201 POST http://test/api/v1/wallets: '
+        '{"wallet_id":1,"name":"foo","balance":0}',
+    ]
+
+
+@pytest.mark.anyio
+async def test_server_timing(ac, session: AsyncSession):
+    response = await ac.post("/api/v1/wallets", json={"name": "foo"})
+    timing = response.headers["server-timing"]
+    assert re.fullmatch(
+        r'db;dur=[\d.]+;desc="[1-9]\d* queries", '
+        r"db-slowest;dur=[\d.]+, app;dur=[\d.]+",
+        timing,
+    )
@@ -0,0 +1,18 @@
+import base64
+import json
+from typing import Any
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(
+        raw.encode()
+    ).decode()
+
+def decode_cursor(cursor: str) -> list[Any]:
+    # 復号・JSONの失敗はいずれもValueErrorとして送出される
+    values = json.loads(
+        base64.urlsafe_b64decode(cursor.encode())
+    )
+    if not isinstance(values, list):
+        raise ValueError(cursor)
+    return values
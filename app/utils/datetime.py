@@ -4,12 +4,27 @@ from pydantic import SerializerFunctionWrapHandler
 def utcnow() -> datetime:
     return datetime.now(tz=timezone.utc)
 
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def month_start(value: datetime) -> datetime:
+    return as_utc(value).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+
+def next_month_start(value: datetime) -> datetime:
+    start = month_start(value)
+    return start.replace(
+        year=start.year + start.month // 12,
+        month=start.month % 12 + 1,
+    )
+
 def to_utc(
     utc_or_native: datetime,
     nxt: SerializerFunctionWrapHandler
 ) -> str:
-    utc_datetime = utc_or_native.replace(
-        tzinfo=timezone.utc
-    )
+    utc_datetime = as_utc(utc_or_native)
     # 前処理をしてから元のシリアライザに渡す
     return nxt(utc_datetime)
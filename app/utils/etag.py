@@ -0,0 +1,17 @@
+def make_etag(*parts: object) -> str:
+    # 表現（include_historiesの有無など）はURLごとに区別されるため弱いETagで十分
+    return 'W/"{}"'.format("-".join(map(str, parts)))
+
+def etag_matches(
+    if_none_match: str | None, etag: str
+) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Matchは弱い比較を使う
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque
+        for tag in if_none_match.split(",")
+    )
@@ -0,0 +1,89 @@
+"""ミドルウェア1段あたりのオーバーヘッドを計測する
+
+    $ python -m benchmarks.middleware
+
+HTTPサーバーを介さずASGIアプリを直接呼び出し、1リクエストあたりの時間を比べる
+"""
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.middlewares import AccessLogMiddleware
+
+REQUESTS = 5000
+
+
+def create_app(kind: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/wallets/{wallet_id}")
+    async def get_wallet(wallet_id: int):
+        return {"wallet_id": wallet_id, "name": "foo", "balance": 0}
+
+    @app.get("/export")
+    async def export():
+        async def lines():
+            for i in range(100):
+                yield b"%d\n" % i
+
+        return StreamingResponse(lines())
+
+    if kind == "base_http":
+        # 以前の @app.middleware("http") による計測
+        @app.middleware("http")
+        async def log_middleware(request, call_next):
+            st = time.perf_counter()
+            response = await call_next(request)
+            time.perf_counter() - st
+            return response
+
+    elif kind == "asgi":
+        app.add_middleware(AccessLogMiddleware)
+    return app
+
+
+async def run(app: FastAPI, path: str) -> float:
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "server": ("bench", 80),
+        "client": ("bench", 1234),
+    }
+    for _ in range(100):
+        await app(dict(scope), receive, send)
+    st = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - st) / REQUESTS * 1_000_000
+
+
+async def main() -> None:
+    print(f"{'middleware':<12}{'json (us)':>12}{'stream (us)':>14}")
+    for kind in ("none", "base_http", "asgi"):
+        app = create_app(kind)
+        json_us = await run(app, "/wallets/1")
+        stream_us = await run(app, "/export")
+        print(f"{kind:<12}{json_us:>12.1f}{stream_us:>14.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
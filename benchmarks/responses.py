@@ -0,0 +1,99 @@
+"""収支項目1万件のWalletのレスポンス生成時間を計測する
+
+    $ python -m benchmarks.responses
+
+以前の経路（スキーマで検証し直し、response_modelで再検証して標準のjsonで出力）と
+render（スキーマのフィールドを取り出してorjsonで出力）を比べる
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.wallets.schemas import GetWalletResponseWithHistories
+from app.database import create_engine
+from app.main import app
+from app.models import HistoryType, NewHistory
+from app.repositories import BaseORM, WalletRepository
+from app.responses import render
+from app.settings import Settings
+
+HISTORIES = 10000
+ROUNDS = 10
+
+
+async def create_wallet():
+    engine = create_engine(Settings(database_url="sqlite+aiosqlite:///:memory:"))
+    async with engine.begin() as conn:
+        await conn.run_sync(BaseORM.metadata.create_all)
+
+    repo = WalletRepository()
+    started_at = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    async with AsyncSession(engine) as session:
+        wallet = await repo.add(session, name="foo")
+        await repo.add_histories(
+            session,
+            wallet.wallet_id,
+            [
+                NewHistory(
+                    name=f"history {i}",
+                    amount=i + 1,
+                    type=HistoryType.INCOME if i % 2 else HistoryType.OUTCOME,
+                    history_at=started_at + timedelta(minutes=i),
+                )
+                for i in range(HISTORIES)
+            ],
+        )
+        await session.commit()
+
+        st = time.perf_counter()
+        wallet = await repo.get_by_id(
+            session, wallet.wallet_id, with_histories=True
+        )
+        loaded = time.perf_counter() - st
+    await engine.dispose()
+    return wallet, loaded
+
+
+async def before(route, wallet) -> bytes:
+    content = await serialize_response(
+        field=route.response_field,
+        response_content=GetWalletResponseWithHistories.model_validate(wallet),
+    )
+    return JSONResponse(content).body
+
+
+async def after(wallet) -> bytes:
+    return render(GetWalletResponseWithHistories, wallet).body
+
+
+async def measure(func, *args) -> tuple[float, bytes]:
+    body = await func(*args)
+    st = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func(*args)
+    return (time.perf_counter() - st) / ROUNDS * 1000, body
+
+
+async def main() -> None:
+    route = next(
+        r
+        for r in app.routes
+        if getattr(r, "path", None) == "/api/v1/wallets/{wallet_id}"
+        and "GET" in r.methods
+    )
+    wallet, loaded = await create_wallet()
+    print(f"load {HISTORIES} histories: {loaded * 1000:.1f} ms")
+
+    before_ms, before_body = await measure(before, route, wallet)
+    after_ms, after_body = await measure(after, wallet)
+    print(f"{'path':<8}{'ms':>8}{'bytes':>10}")
+    print(f"{'before':<8}{before_ms:>8.1f}{len(before_body):>10}")
+    print(f"{'after':<8}{after_ms:>8.1f}{len(after_body):>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())